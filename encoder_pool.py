@@ -0,0 +1,176 @@
+# encoder_pool.py
+"""
+In-process clip encoding with PyAV (already installed as a faster-whisper dependency).
+
+Spawning ffmpeg per clip pays process start, library load and codec lookup every
+time. Encoding here keeps libav loaded in the server process and caches codec
+lookups between jobs. A codec context cannot be reused across output files, so
+each clip still opens its own encoder session.
+"""
+import av
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Encoder private options, mirroring the ffmpeg CLI flags used in server.py
+ENCODER_OPTIONS: Dict[str, Dict[str, str]] = {
+    "h264_nvenc": {"preset": "p4", "tune": "hq", "rc": "vbr", "cq": "23"},
+    "libx264": {},
+}
+
+_codecs: Dict[str, av.Codec] = {}
+
+
+def get_codec(name: str) -> av.Codec:
+    """Look up (and cache) an encoder by name"""
+    codec = _codecs.get(name)
+    if codec is None:
+        codec = _codecs[name] = av.Codec(name, "w")
+    return codec
+
+
+def parse_filter_chain(vf_arg: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Split a -vf chain into (filter_name, args) pairs.
+    Applies the same quoting/escaping level as ffmpeg's graph parser, so the
+    args can be handed straight to the filter like the CLI would.
+    """
+    nodes = []
+    buf: List[str] = []
+    quoted = escaped = False
+    for ch in vf_arg:
+        if escaped:
+            buf.append(ch)
+            escaped = False
+        elif quoted:
+            if ch == "'":
+                quoted = False
+            else:
+                buf.append(ch)
+        elif ch == "'":
+            quoted = True
+        elif ch == "\\":
+            escaped = True
+        elif ch == ",":
+            nodes.append("".join(buf))
+            buf = []
+        else:
+            buf.append(ch)
+    nodes.append("".join(buf))
+
+    chain = []
+    for node in nodes:
+        name, _, args = node.strip().partition("=")
+        if name:
+            chain.append((name, args or None))
+    return chain
+
+
+def _pull_all(sink):
+    frames = []
+    while True:
+        try:
+            frames.append(sink.pull())
+        except (BlockingIOError, EOFError):
+            return frames
+
+
+def encode_clip(
+    input_path: str,
+    start: float,
+    duration: float,
+    vf_arg: str,
+    outpath: str,
+    codec_name: str = "libx264",
+    on_progress: Optional[Callable[[float], None]] = None
+):
+    """
+    Cut [start, start+duration) from input_path, run it through the vf_arg filter
+    chain and encode to outpath (video: codec_name, audio: aac).
+    Raises on any failure so callers can fall back to the ffmpeg CLI.
+    """
+    get_codec(codec_name)
+    end = start + duration
+
+    with av.open(input_path) as src, av.open(outpath, "w") as dst:
+        vin = src.streams.video[0]
+        vin.thread_type = "AUTO"
+        ain = src.streams.audio[0] if src.streams.audio else None
+
+        graph = av.filter.Graph()
+        last = buffer = graph.add_buffer(template=vin)
+        for name, args in parse_filter_chain(vf_arg):
+            node = graph.add(name, args)
+            last.link_to(node)
+            last = node
+        sink = graph.add("buffersink")
+        last.link_to(sink)
+        graph.configure()
+
+        # Streams must all exist before the first packet is muxed, and the video
+        # size is only known once the first frame leaves the filter graph
+        vout = None
+        aout = dst.add_stream("aac", rate=ain.rate) if ain else None
+        pending_audio = []
+        video_offset = int(start / vin.time_base)
+        audio_offset = int(start / ain.time_base) if ain else 0
+
+        def encode_video(frames):
+            nonlocal vout
+            for frame in frames:
+                if vout is None:
+                    vout = dst.add_stream(codec_name, rate=vin.average_rate or 30)
+                    vout.width = frame.width
+                    vout.height = frame.height
+                    vout.pix_fmt = "yuv420p"
+                    vout.codec_context.time_base = vin.time_base
+                    vout.options = ENCODER_OPTIONS.get(codec_name, {})
+                    for packet in pending_audio:
+                        dst.mux(packet)
+                    pending_audio.clear()
+                if frame.format.name != "yuv420p":
+                    frame = frame.reformat(format="yuv420p")
+                dst.mux(vout.encode(frame))
+                if on_progress and frame.time is not None:
+                    on_progress(frame.time)
+
+        def encode_audio(frame):
+            packets = aout.encode(frame)
+            if vout is None:
+                pending_audio.extend(packets)
+            else:
+                dst.mux(packets)
+
+        src.seek(int(start * av.time_base))
+        video_done = False
+        audio_done = ain is None
+        streams = [vin] + ([ain] if ain else [])
+        for packet in src.demux(*streams):
+            if video_done and audio_done:
+                break
+            for frame in packet.decode():
+                if frame.time is None or frame.time < start:
+                    continue
+                if packet.stream.index == vin.index:
+                    if video_done:
+                        continue
+                    if frame.time >= end:
+                        video_done = True
+                        continue
+                    frame.pts -= video_offset
+                    buffer.push(frame)
+                    encode_video(_pull_all(sink))
+                else:
+                    if audio_done:
+                        continue
+                    if frame.time >= end:
+                        audio_done = True
+                        continue
+                    frame.pts -= audio_offset
+                    encode_audio(frame)
+
+        buffer.push(None)
+        encode_video(_pull_all(sink))
+        if vout is None:
+            raise RuntimeError("no video frames in the requested range")
+        dst.mux(vout.encode(None))
+        if aout:
+            encode_audio(None)
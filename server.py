@@ -1,7 +1,12 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, abort
+from werkzeug.utils import safe_join
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from asgiref.wsgi import WsgiToAsgi
+import socketio
+import uvicorn
 import platform
+import mimetypes
 import os
 import yt_dlp
 import asyncio
@@ -11,14 +16,40 @@ import uuid
 import subprocess
 import shutil
 import queue
-from typing import Dict, Any, List, Optional
-import json
+import tempfile
+import math
+from functools import reduce
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from contextlib import ExitStack, contextmanager, nullcontext
+from typing import Dict, Any, List, Optional, Tuple
+from collections import defaultdict
+from dataclasses import dataclass
+import orjson
 try:
-    from faster_whisper import WhisperModel
+    from faster_whisper import WhisperModel, BatchedInferencePipeline
+    import transcribe_worker
     WHISPER_AVAILABLE = True
 except ImportError:
     WHISPER_AVAILABLE = False
     print("Warning: faster-whisper not available")
+try:
+    from mutagen.mp4 import MP4
+except ImportError:
+    MP4 = None
+try:
+    import av  # installed with faster-whisper
+except ImportError:
+    av = None
+try:
+    import fcntl  # reflink copies (Linux only)
+except ImportError:
+    fcntl = None
+try:
+    import encoder_pool
+    INPROCESS_ENCODER = os.getenv("INPROCESS_ENCODER", "0") == "1"
+except ImportError:
+    INPROCESS_ENCODER = False
 
 # Directory constants
 DOWNLOADS_DIR = "downloads"
@@ -30,44 +61,253 @@ STATIC_DIR = "static"
 FONTS_DIR = "fonts"
 DEFAULT_EMOJI_FONT = os.path.join(FONTS_DIR, "NotoColorEmoji-Regular.ttf")
 
+# Directories already created by this process; skips the makedirs syscalls on every job
+_dirs_ok = set()
+_dirs_lock = threading.Lock()
+
+def ensure_dir(path: str):
+    """os.makedirs(path, exist_ok=True), done once per path"""
+    if path in _dirs_ok:
+        return
+    os.makedirs(path, exist_ok=True)
+    with _dirs_lock:
+        _dirs_ok.add(path)
+
 # Create directories
 for dir_path in [DOWNLOADS_DIR, CLIPS_DIR, TRANS_DIR, TEMPLATES_DIR, SESSIONS_DIR, STATIC_DIR, FONTS_DIR]:
-    os.makedirs(dir_path, exist_ok=True)
+    ensure_dir(dir_path)
+
+def detect_hw_encoder():
+    """Return the NVENC encoder name if ffmpeg can actually use it, else None"""
+    try:
+        encoders = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            capture_output=True, text=True, timeout=10
+        ).stdout
+        if "h264_nvenc" not in encoders:
+            return None
+        # Listed encoders only reflect the build; make sure a GPU session opens
+        probe = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-v", "error", "-f", "lavfi", "-i", "nullsrc=s=256x256:d=0.1",
+             "-c:v", "h264_nvenc", "-f", "null", "-"],
+            capture_output=True, timeout=20
+        )
+        return "h264_nvenc" if probe.returncode == 0 else None
+    except Exception:
+        return None
+
+# Hardware encoder (cached once at startup); None means libx264
+HW_ENCODER = detect_hw_encoder()
+# Consumer GPUs cap concurrent NVENC sessions; extra clip jobs wait here instead of failing
+NVENC_MAX_SESSIONS = int(os.getenv("NVENC_MAX_SESSIONS", "3"))
+encode_slots = threading.BoundedSemaphore(NVENC_MAX_SESSIONS) if HW_ENCODER else nullcontext()
 
 # Job management
-job_queue = queue.Queue()
-jobs: Dict[str, Dict[str, Any]] = {}
+# One thread pool per kind so slow downloads never hold up clips or transcriptions
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+CLIP_WORKERS = int(os.getenv("CLIP_WORKERS", str(max(2, (os.cpu_count() or 2) // 2))))
+# Concurrent transcribe jobs share one model, each on its own ctranslate2 worker
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+executors: Dict[str, ThreadPoolExecutor] = {
+    "download": ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download"),
+    "clip": ThreadPoolExecutor(max_workers=CLIP_WORKERS, thread_name_prefix="clip"),
+    "transcribe": ThreadPoolExecutor(max_workers=TRANSCRIBE_WORKERS, thread_name_prefix="transcribe"),
+}
+EXECUTOR_FOR_KIND = {"download": "download", "transcribe": "transcribe", "clip": "clip", "clip_template": "clip", "clip_batch": "clip"}
+@dataclass(slots=True)
+class Job:
+    """Live job state; attribute stores keep progress updates cheap on the hot path"""
+    id: str
+    kind: str
+    meta: dict
+    status: str = "queued"
+    progress: float = 0.0
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+jobs: Dict[str, Job] = {}
 clips_metadata: Dict[str, Dict[str, Any]] = {}  # clip_filename -> metadata
-templates: Dict[str, Dict[str, Any]] = {}  # template_name -> template_data
-whisper_model = None
+clips_by_video: Dict[str, List[str]] = defaultdict(list)  # source video filename -> clip_filenames
+clips_versions: Dict[str, int] = defaultdict(int)  # source video filename -> bumped on every change
+clips_cache: Dict[str, Tuple[tuple, bytes]] = {}  # source video filename -> (cache key, response JSON)
+clips_lock = threading.Lock()
+_template_cache: Dict[str, Tuple[int, dict]] = {}  # template_name -> (mtime_ns, template_data)
+whisper_models: Dict[str, Any] = {}  # model name -> WhisperModel
+batched_models: Dict[str, Any] = {}  # model name -> BatchedInferencePipeline sharing its weights
+WHISPER_DEVICE = "cuda" if os.getenv("USE_CUDA", "0") == "1" else "cpu"
+# Chunks decoded per forward pass; past 8 the CPU gains flatten while memory keeps growing
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "16" if WHISPER_DEVICE == "cuda" else "8"))
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app, origins=["*"], methods=["GET", "POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "X-Requested-With"])
-socketio = SocketIO(app, cors_allowed_origins=["*"], async_mode='threading')
+# Socket.IO runs on the ASGI event loop; Flask is served next to it through WsgiToAsgi
+class OrjsonSocketSerializer:
+    """json-module stand-in so Socket.IO packets are encoded with orjson"""
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*", json=OrjsonSocketSerializer)
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+async def _capture_loop():
+    global _loop
+    _loop = asyncio.get_running_loop()
+
+asgi_app = socketio.ASGIApp(sio, other_asgi_app=WsgiToAsgi(app), on_startup=_capture_loop)
+
+def emit_event(event: str, data, to: Optional[str] = None):
+    """Emit from any thread; the send itself runs on the event loop"""
+    if _loop is None:
+        return
+    asyncio.run_coroutine_threadsafe(sio.emit(event, data, to=to), _loop)
+
+# Job store. jobs holds the live state the worker threads read. update_job is
+# the only way to change a job: it records which fields changed for the next emit.
+JOB_FIELDS = ("kind", "status", "progress", "meta", "result", "error", "created_at", "updated_at")
+
+def job_snapshot(job: Job) -> dict:
+    """Full job object, in the same shape as an emitted delta"""
+    return {"id": job.id, **{field: getattr(job, field) for field in JOB_FIELDS}}
+
+# Emit throttling: progress updates for a job go out at most every
+# JOB_UPDATE_INTERVAL seconds; anything in between is coalesced and flushed
+# in one batch by a timer. Status changes are always sent immediately.
+# Only fields changed since the last emit are sent ({"id": ..., field: value}).
+JOB_UPDATE_INTERVAL = 0.1
+JOB_FINAL_STATUSES = ("finished", "error")
+_emit_lock = threading.Lock()
+_pending_updates = set()
+_pending_logs: List[str] = []
+_last_emit: Dict[str, float] = {}
+_dirty_fields: Dict[str, set] = defaultdict(set)  # job_id -> fields changed since last emit
+_flush_timer = None
+
+def _schedule_flush():
+    # Caller holds _emit_lock
+    global _flush_timer
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(JOB_UPDATE_INTERVAL, flush_updates)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+def _take_delta(job_id: str) -> dict:
+    # Caller holds _emit_lock
+    job = jobs.get(job_id)
+    delta = {"id": job_id}
+    for field in _dirty_fields.pop(job_id, ()):
+        delta[field] = getattr(job, field)
+    if job is None or job.status in JOB_FINAL_STATUSES:
+        # nothing more will be throttled for this job
+        _last_emit.pop(job_id, None)
+    return delta
+
+def flush_updates():
+    """Send all coalesced job updates and log lines as one event each"""
+    global _flush_timer
+    with _emit_lock:
+        job_ids = list(_pending_updates)
+        _pending_updates.clear()
+        lines = _pending_logs[:]
+        _pending_logs.clear()
+        now = time.monotonic()
+        job_ids = [job_id for job_id in job_ids if job_id in jobs]
+        for job_id in job_ids:
+            _last_emit[job_id] = now
+        deltas = [_take_delta(job_id) for job_id in job_ids]
+        _flush_timer = None
+    if deltas:
+        emit_event('job_updates', deltas)
+    if lines:
+        emit_event('log_batch', lines)
 
 def log(message):
     print(message)
-    socketio.emit('log', message)
+    with _emit_lock:
+        _pending_logs.append(message)
+        _schedule_flush()
 
 # Job management functions
 def create_job(kind: str, meta: dict) -> str:
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {
-        "id": job_id,
-        "kind": kind,
-        "meta": meta,
-        "status": "queued",
-        "progress": 0.0,
-        "created_at": time.time(),
-        "updated_at": time.time(),
-        "result": None,
-        "error": None
-    }
+    now = time.time()
+    job = Job(id=job_id, kind=kind, meta=meta, created_at=now, updated_at=now)
+    jobs[job_id] = job
+    with _emit_lock:
+        _dirty_fields[job_id].update(JOB_FIELDS)
     return job_id
 
-def push_job_update(job_id: str):
-    state = jobs.get(job_id, {})
-    socketio.emit('job_update', state)
+def update_job(job_id: str, **fields):
+    """Change job fields and mark them for the next emit"""
+    fields["updated_at"] = time.time()
+    job = jobs[job_id]
+    for field, value in fields.items():
+        setattr(job, field, value)
+    with _emit_lock:
+        _dirty_fields[job_id].update(fields)
+
+def push_job_update(job_id: str) -> bool:
+    """Emit the job's changed fields, or queue them for the next batch if an update
+    went out too recently. Returns True when the update was emitted right away."""
+    now = time.monotonic()
+    with _emit_lock:
+        status_changed = "status" in _dirty_fields.get(job_id, ())
+        if not status_changed and now - _last_emit.get(job_id, 0.0) < JOB_UPDATE_INTERVAL:
+            _pending_updates.add(job_id)
+            _schedule_flush()
+            return False
+        _last_emit[job_id] = now
+        _pending_updates.discard(job_id)
+        delta = _take_delta(job_id)
+    emit_event('job_update', delta)
+    return True
+
+# Filter escaping. A drawtext value goes through three parsers, innermost first:
+# drawtext's own text expansion, the filter option parser and the filtergraph
+# parser. Each table escapes one level; composing them gives a single
+# str.translate pass per value.
+_TEXT_EXPANSION_ESCAPE = str.maketrans({"\\": "\\\\", "%": "\\%"})
+_OPTION_ESCAPE = str.maketrans({"\\": "\\\\", "'": "\\'", ":": "\\:"})
+_GRAPH_ESCAPE = str.maketrans({c: "\\" + c for c in "\\'[],;"})
+
+def _compose_escapes(*tables):
+    chars = set().union(*tables)
+    return str.maketrans({
+        chr(c): reduce(lambda acc, table: acc.translate(table), tables, chr(c))
+        for c in chars
+    })
+
+_DRAWTEXT_ESCAPE = _compose_escapes(_TEXT_EXPANSION_ESCAPE, _OPTION_ESCAPE, _GRAPH_ESCAPE)
+_FILTER_VALUE_ESCAPE = _compose_escapes(_OPTION_ESCAPE, _GRAPH_ESCAPE)
+
+def escape_drawtext_text(text: str) -> str:
+    """Escape text for drawtext=text=... inside a filter chain (no extra quoting needed)"""
+    return text.translate(_DRAWTEXT_ESCAPE)
+
+def escape_filter_value(value) -> str:
+    """Escape an option value (path, expression) for use inside a filter chain"""
+    return str(value).translate(_FILTER_VALUE_ESCAPE)
+
+def write_filter_script(vf_arg: str) -> str:
+    """Write a filter chain to a temp file for -filter_script:v; caller removes it"""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+        f.write(vf_arg)
+        return f.name
 
 def vertical_filter():
     return "crop=in_h*9/16:in_h:(in_w-(in_h*9/16))/2:0,scale=1080:1920"
@@ -76,190 +316,245 @@ def mobile_full_width_filter():
     # Scale to 1080:1920 maintaining aspect ratio, padding with black bars if needed
     return "scale=1080:1920:force_original_aspect_ratio=decrease,pad=1080:1920:(ow-iw)/2:(oh-ih)/2:black"
 
-def ffmpeg_time_to_secs(timestr: str) -> float:
+def build_copy_cmd(input_path: str, start: float, duration: float, outpath: str) -> List[str]:
+    """Cut without re-encoding; the start snaps to the keyframe before it"""
+    return [
+        "ffmpeg", "-y",
+        "-ss", str(start), "-i", input_path,
+        "-t", str(duration),
+        "-c", "copy", "-avoid_negative_ts", "make_zero",
+        outpath
+    ]
+
+def build_ffmpeg_cmd(input_path: str, start: float, duration: float, filter_script: str, outpath: str) -> List[str]:
+    """Build the clip encode command, using NVDEC/NVENC when available"""
+    cmd = ["ffmpeg", "-y"]
+    if HW_ENCODER:
+        # Decode on the GPU; frames come back to system memory for the CPU-only
+        # filters (crop, drawtext) and go straight into NVENC
+        cmd += ["-hwaccel", "cuda"]
+    cmd += [
+        "-ss", str(start), "-i", input_path,
+        "-t", str(duration),
+        "-filter_script:v", filter_script,
+    ]
+    cmd += encoder_args() + [outpath]
+    return cmd
+
+def encoder_args() -> List[str]:
+    """Output codec options for one clip"""
+    if HW_ENCODER:
+        return ["-c:v", HW_ENCODER, "-preset", "p4", "-tune", "hq", "-rc", "vbr", "-cq", "23", "-c:a", "aac"]
+    return ["-c:v", "libx264", "-c:a", "aac"]
+
+def build_batch_ffmpeg_cmd(input_path: str, base: float, outputs: List[Tuple[float, float, str, str]]) -> List[str]:
+    """Build one command that decodes input_path once and writes every
+    (start, duration, filter_script, outpath) output; starts are absolute"""
+    cmd = ["ffmpeg", "-y"]
+    if HW_ENCODER:
+        cmd += ["-hwaccel", "cuda"]
+    # Seek the shared input to the earliest clip; each output then skips to its own offset
+    cmd += ["-ss", str(base), "-i", input_path]
+    for start, duration, filter_script, outpath in outputs:
+        cmd += [
+            "-map", "0:v:0", "-map", "0:a?",
+            "-ss", str(start - base), "-t", str(duration),
+            "-filter_script:v", filter_script,
+        ]
+        cmd += encoder_args() + [outpath]
+    return cmd
+
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+def fast_copy(src: str, dst: str):
+    """Copy src to dst as a hard link, else a reflink, else a byte copy.
+    Links need SESSIONS_DIR on the same filesystem as CLIPS_DIR/DOWNLOADS_DIR."""
+    try:
+        os.link(src, dst)
+        return
+    except FileExistsError:
+        # Replace an older file atomically: link under a temp name, then rename over it
+        tmp = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            os.link(src, tmp)
+            os.replace(tmp, dst)
+            return
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    except OSError:
+        pass
+    # Clone/copy under a temp name and rename over dst: writing into an existing
+    # dst would rewrite the inode it may share with another session's link
+    tmp = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        cloned = False
+        if fcntl is not None:
+            try:
+                # Copy-on-write clone (Btrfs, XFS); shares extents, copies no data
+                with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                cloned = True
+            except OSError:
+                pass
+        if not cloned:
+            shutil.copy(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+@contextmanager
+def atomic_output(path: str):
+    """Yield a temp path to render path into; it replaces path only if the block succeeds.
+    Every render gets a new inode, so session links to an earlier render keep their contents."""
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.{uuid.uuid4().hex[:8]}.tmp{ext}"  # keep the extension: ffmpeg/PyAV pick the muxer from it
     try:
-        parts = timestr.split(':')
-        h, m, s = int(parts[0]), int(parts[1]), float(parts[2])
-        return h*3600 + m*60 + s
-    except:
-        return 0.0
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+_session_dirs: Dict[str, str] = {}  # session_id -> its created folder
+
+def ensure_session_dir(session_id: str) -> str:
+    """Return the session's folder, creating it the first time"""
+    folder = _session_dirs.get(session_id)
+    if folder is None:
+        folder = os.path.join(SESSIONS_DIR, session_id)
+        ensure_dir(folder)
+        _session_dirs[session_id] = folder
+    return folder
 
 def uuid_name(base: str = "") -> str:
     return f"{base}_{uuid.uuid4().hex[:8]}" if base else uuid.uuid4().hex[:8]
 
 # Template management functions
-def load_templates():
-    """Load all templates from JSON files"""
-    global templates
-    templates = {}
-    if os.path.exists(TEMPLATES_DIR):
-        for file in os.listdir(TEMPLATES_DIR):
-            if file.endswith('.json'):
-                template_name = os.path.splitext(file)[0]
-                try:
-                    with open(os.path.join(TEMPLATES_DIR, file), 'r') as f:
-                        templates[template_name] = json.load(f)
-                except Exception as e:
-                    print(f"Error loading template {template_name}: {e}")
+def get_template(template_name: str) -> dict:
+    """Load a template on demand, re-reading it only when its file changed"""
+    if os.path.basename(template_name) != template_name:
+        raise FileNotFoundError(template_name)
+    template_path = os.path.join(TEMPLATES_DIR, f"{template_name}.json")
+    mtime = os.stat(template_path).st_mtime_ns
+    cached = _template_cache.get(template_name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(template_path, 'rb') as f:
+        data = orjson.loads(f.read())
+    _template_cache[template_name] = (mtime, data)
+    return data
 
 def save_template(template_name: str, template_data: dict):
     """Save a template to JSON file"""
     template_path = os.path.join(TEMPLATES_DIR, f"{template_name}.json")
-    with open(template_path, 'w') as f:
-        json.dump(template_data, f, indent=2)
-    templates[template_name] = template_data
+    with open(template_path, 'wb') as f:
+        f.write(orjson.dumps(template_data, option=orjson.OPT_INDENT_2))
+    _template_cache[template_name] = (os.stat(template_path).st_mtime_ns, template_data)
 
 def get_templates_list():
-    """Get list of available templates"""
-    return [{"name": name, "data": data} for name, data in templates.items()]
+    """Get names of available templates (data is fetched per template)"""
+    with os.scandir(TEMPLATES_DIR) as it:
+        names = sorted(
+            entry.name[:-5] for entry in it
+            if entry.name.endswith('.json') and entry.is_file()
+        )
+    return [{"name": name} for name in names]
+
+# Optional drawtext options: (flag key, formatter). Each formatter returns the
+# options to append when the overlay sets the flag.
+_TEXT_OPT_TABLE = (
+    ("box", lambda o: f":box=1:boxcolor={o.get('boxColor', 'black@0.6')}:boxborderw={o.get('boxBorder', 10)}"),
+    ("shadow", lambda o: f":shadowcolor={o.get('shadowColor', 'black@0.8')}:shadowx={o.get('shadowX', 2)}:shadowy={o.get('shadowY', 2)}"),
+    ("stroke", lambda o: f":bordercolor={o.get('strokeColor', 'black')}:borderw={o.get('strokeWidth', 1)}"),
+)
+_EMOJI_OPT_TABLE = (
+    ("shadow", lambda o: ":shadowcolor=black@0.8:shadowx=2:shadowy=2"),
+)
+# Per overlay type: (content key, default font size, font color key or None for white, option table)
+_OVERLAY_TYPES = {
+    "text": ("text", 28, "textColor", _TEXT_OPT_TABLE),
+    "emoji": ("emoji", 48, None, _EMOJI_OPT_TABLE),
+}
 
 def generate_overlay_filter(overlays):
     """Generate FFmpeg filter string for overlay elements"""
     filters = []
 
-    for i, overlay in enumerate(overlays):
-        overlay_type = overlay.get("type", "text")
-
-        if overlay_type == "text":
-            # Text overlay
-            text = overlay.get("text", "")
-            if not text:
-                continue
-
-            safe_text = text.replace("'", "\\'").replace(":", "\\:")
-
-            # Position
-            x = overlay.get("x", "(w-text_w)/2")
-            y = overlay.get("y", "(h-text_h)/2")
-
-            # Font settings
-            font_file = overlay.get("font", DEFAULT_EMOJI_FONT)
-            # If no font specified, use default emoji font
-            if not font_file:
-                font_file = DEFAULT_EMOJI_FONT
-            font_size = overlay.get("fontSize", 28)
-            font_color = overlay.get("textColor", "white")
-
-            # Build drawtext filter
-            drawtext = f"drawtext=text='{safe_text}':fontfile={font_file}:fontsize={font_size}:fontcolor={font_color}"
-
-            # Add positioning
-            drawtext += f":x={x}:y={y}"
-
-            # Box/background
-            if overlay.get("box", False):
-                box_color = overlay.get("boxColor", "black@0.6")
-                box_border = overlay.get("boxBorder", 10)
-                drawtext += f":box=1:boxcolor={box_color}:boxborderw={box_border}"
-
-            # Shadow
-            if overlay.get("shadow", False):
-                shadow_color = overlay.get("shadowColor", "black@0.8")
-                shadow_x = overlay.get("shadowX", 2)
-                shadow_y = overlay.get("shadowY", 2)
-                drawtext += f":shadowcolor={shadow_color}:shadowx={shadow_x}:shadowy={shadow_y}"
-
-            # Stroke/outline
-            if overlay.get("stroke", False):
-                stroke_color = overlay.get("strokeColor", "black")
-                stroke_width = overlay.get("strokeWidth", 1)
-                drawtext += f":bordercolor={stroke_color}:borderw={stroke_width}"
-
-            filters.append(drawtext)
-
-        elif overlay_type == "emoji":
-            # Emoji overlay (treated as text)
-            emoji = overlay.get("emoji", "")
-            if not emoji:
-                continue
-
-            x = overlay.get("x", "(w-text_w)/2")
-            y = overlay.get("y", "(h-text_h)/2")
-            font_size = overlay.get("fontSize", 48)
-            font_file = overlay.get("font", DEFAULT_EMOJI_FONT)
-            # If no font specified, use default emoji font
-            if not font_file:
-                font_file = DEFAULT_EMOJI_FONT
-
-            drawtext = f"drawtext=text='{emoji}':fontfile={font_file}:fontsize={font_size}:fontcolor=white:x={x}:y={y}"
-
-            if overlay.get("shadow", False):
-                drawtext += ":shadowcolor=black@0.8:shadowx=2:shadowy=2"
-
-            filters.append(drawtext)
-
-        elif overlay_type == "image":
-            # Image overlay (future enhancement)
-            # Would require additional FFmpeg filter complexity
-            pass
+    for overlay in overlays:
+        # Image overlays (future enhancement) would need more filter complexity
+        spec = _OVERLAY_TYPES.get(overlay.get("type", "text"))
+        if spec is None:
+            continue
+        content_key, default_size, color_key, opt_table = spec
+        content = overlay.get(content_key, "")
+        if not content:
+            continue
 
-    return filters
+        font_file = escape_filter_value(overlay.get("font") or DEFAULT_EMOJI_FONT)
+        font_color = overlay.get(color_key, "white") if color_key else "white"
+        parts = [
+            f"drawtext=text={escape_drawtext_text(content)}:fontfile={font_file}",
+            f":fontsize={overlay.get('fontSize', default_size)}:fontcolor={font_color}",
+            f":x={escape_filter_value(overlay.get('x', '(w-text_w)/2'))}",
+            f":y={escape_filter_value(overlay.get('y', '(h-text_h)/2'))}",
+        ]
+        for key, fmt in opt_table:
+            if overlay.get(key):
+                parts.append(fmt(overlay))
+        filters.append("".join(parts))
 
-# Template management functions
-def load_templates():
-    """Load all templates from JSON files"""
-    global templates
-    templates = {}
-    if os.path.exists(TEMPLATES_DIR):
-        for file in os.listdir(TEMPLATES_DIR):
-            if file.endswith('.json'):
-                template_name = os.path.splitext(file)[0]
-                try:
-                    with open(os.path.join(TEMPLATES_DIR, file), 'r') as f:
-                        templates[template_name] = json.load(f)
-                except Exception as e:
-                    print(f"Error loading template {template_name}: {e}")
+    return filters
 
-def save_template(template_name: str, template_data: dict):
-    """Save a template to JSON file"""
-    template_path = os.path.join(TEMPLATES_DIR, f"{template_name}.json")
-    with open(template_path, 'w') as f:
-        json.dump(template_data, f, indent=2)
-    templates[template_name] = template_data
+FONT_DIRS = [
+    "/System/Library/Fonts",  # macOS
+    "/Library/Fonts",         # macOS user fonts
+    "/usr/share/fonts",       # Linux
+    "/usr/local/share/fonts", # Linux
+    "C:\\Windows\\Fonts",     # Windows
+    FONTS_DIR,                # Our custom fonts directory
+]
+_FONT_EXTS = ('.ttf', '.otf', '.woff', '.woff2')
+_fonts_cache = None  # (((dir, mtime_ns), ...), fonts)
+
+def _scan_font_dir(path: str, dir_mtimes: list):
+    """Yield (filename, full_path) for every font below path, recording each directory's mtime"""
+    try:
+        dir_mtimes.append((path, os.stat(path).st_mtime_ns))
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _scan_font_dir(entry.path, dir_mtimes)
+        elif entry.name.lower().endswith(_FONT_EXTS):
+            yield entry.name, entry.path
 
-def get_templates_list():
-    """Get list of available templates"""
-    return [{"name": name, "data": data} for name, data in templates.items()]
+def _font_dirs_unchanged(dir_mtimes) -> bool:
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime for path, mtime in dir_mtimes)
+    except OSError:
+        return False
 
 def get_system_fonts():
-    """Get list of available system fonts"""
-    fonts = []
-
-    # Common font directories
-    font_dirs = [
-        "/System/Library/Fonts",  # macOS
-        "/Library/Fonts",         # macOS user fonts
-        "/usr/share/fonts",       # Linux
-        "/usr/local/share/fonts", # Linux
-        "C:\\Windows\\Fonts",     # Windows
-    ]
-
-    # Also check our custom fonts directory
-    if os.path.exists(FONTS_DIR):
-        font_dirs.append(FONTS_DIR)
-
-    for font_dir in font_dirs:
-        if os.path.exists(font_dir):
-            for root, dirs, files in os.walk(font_dir):
-                for file in files:
-                    if file.lower().endswith(('.ttf', '.otf', '.woff', '.woff2')):
-                        # Get just the filename without extension for FFmpeg
-                        font_name = os.path.splitext(file)[0]
-                        fonts.append({
-                            "name": font_name,
-                            "file": os.path.join(root, file),
-                            "path": os.path.join(root, file)
-                        })
-
-    # Remove duplicates and sort
-    seen = set()
-    unique_fonts = []
-    for font in fonts:
-        if font['name'] not in seen:
-            seen.add(font['name'])
-            unique_fonts.append(font)
-
-    return sorted(unique_fonts, key=lambda x: x['name'])
+    """Get list of available system fonts (cached until a font directory changes)"""
+    global _fonts_cache
+    if _fonts_cache is not None and _font_dirs_unchanged(_fonts_cache[0]):
+        return _fonts_cache[1]
+
+    dir_mtimes = []
+    fonts_by_name = {}
+    for font_dir in FONT_DIRS:
+        for file, path in _scan_font_dir(font_dir, dir_mtimes):
+            # Get just the filename without extension for FFmpeg
+            font_name = os.path.splitext(file)[0]
+            fonts_by_name.setdefault(font_name, {"name": font_name, "file": path, "path": path})
+
+    fonts = sorted(fonts_by_name.values(), key=lambda x: x['name'])
+    _fonts_cache = (tuple(dir_mtimes), fonts)
+    return fonts
 
 # API Endpoints
 @app.route('/api/data')
@@ -270,14 +565,21 @@ def data():
 @app.route('/api/job/<job_id>')
 def get_job(job_id):
     job = jobs.get(job_id)
-    if not job:
+    if job is None:
         return {"error": "job not found"}, 404
-    return job
+    return job_snapshot(job)
 
 @app.route('/api/templates')
 def get_templates():
     return {"templates": get_templates_list()}
 
+@app.route('/api/templates/<template_name>')
+def get_template_data(template_name):
+    try:
+        return {"name": template_name, "data": get_template(template_name)}
+    except FileNotFoundError:
+        return {"error": "template not found"}, 404
+
 @app.route('/api/fonts')
 def get_fonts():
     return {"fonts": get_system_fonts()}
@@ -301,66 +603,77 @@ def create_template():
     save_template(template_name, template_data)
     return {"message": "template created", "name": template_name}
 
+def register_clip(clip_filename: str, metadata: dict):
+    """Store clip metadata and invalidate the cached clip list of its source video"""
+    video_filename = metadata["source_video"]
+    with clips_lock:
+        if clip_filename not in clips_metadata:
+            clips_by_video[video_filename].append(clip_filename)
+        clips_metadata[clip_filename] = metadata
+        clips_versions[video_filename] += 1
+
+def clip_listing(clip_filename: str, metadata: dict, path: str, created_at: float) -> dict:
+    # Handle both old format (text) and new format (overlays)
+    text_content = ""
+    if "overlays" in metadata:
+        # Extract text from overlays for display
+        text_overlays = [o for o in metadata["overlays"] if o.get("type") == "text"]
+        if text_overlays:
+            text_content = text_overlays[0].get("text", "")
+    elif "text" in metadata:
+        text_content = metadata["text"]
+
+    return {
+        "filename": clip_filename,
+        "start": metadata.get("start", 0),
+        "end": metadata.get("end", 0),
+        "text": text_content,
+        "overlays": metadata.get("overlays", []),
+        "template": metadata.get("template", ""),
+        "created_at": metadata.get("created_at", created_at),
+        "path": path
+    }
+
 @app.route('/api/clips/<path:video_filename>')
 def get_clips_for_video(video_filename):
-    clips = []
     video_name = os.path.splitext(video_filename)[0]  # Remove extension
+    video_clips_dir = os.path.join(CLIPS_DIR, video_name)
+
+    # The folder mtime catches clips added or removed outside register_clip
+    try:
+        dir_mtime = os.stat(video_clips_dir).st_mtime_ns
+    except FileNotFoundError:
+        dir_mtime = None
+    cache_key = (clips_versions.get(video_filename, 0), dir_mtime)
+    cached = clips_cache.get(video_filename)
+    if cached and cached[0] == cache_key:
+        return app.response_class(cached[1], mimetype="application/json")
+
+    clips = []
 
     # Check video-specific folder
-    video_clips_dir = os.path.join(CLIPS_DIR, video_name)
-    if os.path.exists(video_clips_dir):
-        for clip_file in os.listdir(video_clips_dir):
-            if clip_file.endswith('.mp4'):
-                clip_path = os.path.join(video_clips_dir, clip_file)
-                clip_filename = f"{video_name}/{clip_file}"  # Include folder in path
-
-                # Get metadata if available
-                metadata = clips_metadata.get(clip_filename, {})
-
-                # Handle both old format (text) and new format (overlays)
-                text_content = ""
-                if "overlays" in metadata:
-                    # Extract text from overlays for display
-                    text_overlays = [o for o in metadata["overlays"] if o.get("type") == "text"]
-                    if text_overlays:
-                        text_content = text_overlays[0].get("text", "")
-                elif "text" in metadata:
-                    text_content = metadata["text"]
-
-                clips.append({
-                    "filename": clip_filename,
-                    "start": metadata.get("start", 0),
-                    "end": metadata.get("end", 0),
-                    "text": text_content,
-                    "overlays": metadata.get("overlays", []),
-                    "template": metadata.get("template", ""),
-                    "created_at": metadata.get("created_at", os.path.getctime(clip_path)),
-                    "path": clip_path
-                })
+    if dir_mtime is not None:
+        with os.scandir(video_clips_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.mp4'):
+                    clip_filename = f"{video_name}/{entry.name}"  # Include folder in path
+                    # Get metadata if available
+                    metadata = clips_metadata.get(clip_filename, {})
+                    clips.append(clip_listing(clip_filename, metadata, entry.path, entry.stat().st_ctime))
 
     # Also check legacy clips (for backward compatibility)
-    for clip_filename, metadata in clips_metadata.items():
-        if metadata.get("source_video") == video_filename and not clip_filename.startswith(f"{video_name}/"):
-            text_content = ""
-            if "overlays" in metadata:
-                text_overlays = [o for o in metadata["overlays"] if o.get("type") == "text"]
-                if text_overlays:
-                    text_content = text_overlays[0].get("text", "")
-            elif "text" in metadata:
-                text_content = metadata["text"]
-
-            clips.append({
-                "filename": clip_filename,
-                "start": metadata["start"],
-                "end": metadata["end"],
-                "text": text_content,
-                "overlays": metadata.get("overlays", []),
-                "template": metadata.get("template", ""),
-                "created_at": metadata["created_at"],
-                "path": metadata["path"]
-            })
-
-    return {"clips": clips}
+    with clips_lock:
+        legacy = [
+            (clip_filename, clips_metadata[clip_filename])
+            for clip_filename in clips_by_video.get(video_filename, [])
+            if not clip_filename.startswith(f"{video_name}/")
+        ]
+    for clip_filename, metadata in legacy:
+        clips.append(clip_listing(clip_filename, metadata, metadata["path"], metadata["created_at"]))
+
+    body = orjson.dumps({"clips": clips})
+    clips_cache[video_filename] = (cache_key, body)
+    return app.response_class(body, mimetype="application/json")
 
 @app.route('/api/download', methods=['POST', 'OPTIONS'])
 def api_download():
@@ -379,7 +692,7 @@ def api_download():
         return {"error": "url required"}, 400
 
     job_id = create_job("download", {"url": url, "session_id": session_id})
-    job_queue.put(job_id)
+    enqueue_job(job_id)
     push_job_update(job_id)
     return {"job_id": job_id}
 
@@ -395,16 +708,26 @@ def api_transcribe():
     data = request.get_json()
     filename = data.get('filename')
     session_id = data.get('session_id')
+    language = data.get('language')
 
     if not filename:
         return {"error": "filename required"}, 400
 
-    job_id = create_job("transcribe", {"filename": filename, "session_id": session_id})
-    job_queue.put(job_id)
+    job_id = create_job("transcribe", {"filename": filename, "session_id": session_id, "language": language})
+    enqueue_job(job_id)
     push_job_update(job_id)
     return {"job_id": job_id}
 
+def _is_number(value) -> bool:
+    if value is None or isinstance(value, bool):
+        return False
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        return False
+
 @app.route('/api/clip', methods=['POST', 'OPTIONS'])
+@app.route('/api/clip-batch', methods=['POST', 'OPTIONS'])
 def api_clip():
     if request.method == 'OPTIONS':
         # Handle preflight request
@@ -421,6 +744,22 @@ def api_clip():
     text = data.get('text', '')
     session_id = data.get('session_id')
     output_name = data.get('output_name')
+    clips = data.get('clips')
+
+    # Several clips from one video: cut them all in a single ffmpeg run
+    if clips:
+        if not filename or not isinstance(clips, list) or not all(
+            isinstance(c, dict) and _is_number(c.get('start')) and _is_number(c.get('end')) for c in clips
+        ):
+            return {"error": "filename and numeric start/end for every clip required"}, 400
+        job_id = create_job("clip_batch", {
+            "filename": filename,
+            "clips": clips,
+            "session_id": session_id
+        })
+        enqueue_job(job_id)
+        push_job_update(job_id)
+        return {"job_id": job_id}
 
     if not all([filename, start is not None, end is not None]):
         return {"error": "filename, start, end required"}, 400
@@ -430,10 +769,13 @@ def api_clip():
         "start": start,
         "end": end,
         "text": text,
+        "flip": bool(data.get('flip', False)),
+        "vertical": bool(data.get('vertical', True)),
+        "exact_cut": bool(data.get('exact_cut', False)),
         "session_id": session_id,
         "output_name": output_name
     })
-    job_queue.put(job_id)
+    enqueue_job(job_id)
     push_job_update(job_id)
     return {"job_id": job_id}
 
@@ -460,11 +802,11 @@ def api_clip_with_template():
     if not filename or not template_name:
         return {"error": "filename and template_name required"}, 400
 
-    if template_name not in templates:
+    try:
+        template = get_template(template_name).copy()
+    except FileNotFoundError:
         return {"error": "template not found"}, 404
 
-    template = templates[template_name].copy()
-
     # Override with custom properties if provided
     if custom_overlays is not None:
         template["overlays"] = custom_overlays
@@ -484,7 +826,7 @@ def api_clip_with_template():
         "template": template,
         "session_id": session_id
     })
-    job_queue.put(job_id)
+    enqueue_job(job_id)
     push_job_update(job_id)
     return {"job_id": job_id}
 
@@ -499,40 +841,43 @@ def os_details():
         "processor": platform.processor()
     }
 
-@socketio.on('download')
-def handle_download(data):
+@sio.on('connect')
+async def handle_connect(sid, environ, auth=None):
+    # job_update(s) only carry changed fields; give a new client every job in full first
+    snapshots = [job_snapshot(job) for job in list(jobs.values())]
+    if snapshots:
+        await sio.emit('job_updates', snapshots, to=sid)
+
+@sio.on('download')
+async def handle_download(sid, data):
     url = data.get('url')
     session_id = data.get('session_id')
 
     if not url:
-        emit('error', {"message": "No URL provided"})
+        await sio.emit('error', {"message": "No URL provided"}, to=sid)
         return
 
     job_id = create_job("download", {"url": url, "session_id": session_id})
-    job_queue.put(job_id)
+    enqueue_job(job_id)
     push_job_update(job_id)
-    emit('download_started', {"job_id": job_id})
+    await sio.emit('download_started', {"job_id": job_id}, to=sid)
+
+def list_videos():
+    return scan_videos('./downloads')
 
-@socketio.on('get_videos')
-def handle_get_videos():
+@sio.on('get_videos')
+async def handle_get_videos(sid):
     log("Getting videos list")
-    downloads_dir = './downloads'
-    videos_list = []
-    if os.path.exists(downloads_dir):
-        for file in os.listdir(downloads_dir):
-            if file.endswith('.mp4'):
-                path = os.path.join(downloads_dir, file)
-                title = os.path.splitext(file)[0]  # filename without .mp4
-                videos_list.append({"title": title, "path": path})
-    socketio.emit('videos_update', videos_list)
+    videos_list = await asyncio.to_thread(list_videos)
+    await sio.emit('videos_update', videos_list)
 
 # Background job functions
 def do_download(job_id: str):
-    jobs[job_id]["status"] = "running"
+    update_job(job_id, status="running")
     push_job_update(job_id)
 
-    url = jobs[job_id]["meta"]["url"]
-    session_id = jobs[job_id]["meta"].get("session_id")
+    url = jobs[job_id].meta["url"]
+    session_id = jobs[job_id].meta.get("session_id")
 
     outname = f"{int(time.time())}_{uuid.uuid4().hex[:8]}.mp4"
     outpath = os.path.join(DOWNLOADS_DIR, outname)
@@ -545,17 +890,10 @@ def do_download(job_id: str):
     }
 
     def progress(d):
+        # Runs per chunk on yt-dlp's thread: only record the latest numbers, the drain thread emits
         if d.get("status") == "downloading":
             total_bytes = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
-            downloaded = d.get("downloaded_bytes") or 0
-            prog = (downloaded / total_bytes * 100) if total_bytes else 0.0
-            jobs[job_id]["progress"] = round(prog, 2)
-            jobs[job_id]["updated_at"] = time.time()
-            socketio.emit('download_progress', {"job_id": job_id, "progress": jobs[job_id]["progress"]})
-            push_job_update(job_id)
-        elif d.get("status") == "finished":
-            jobs[job_id]["progress"] = 100.0
-            push_job_update(job_id)
+            _dl_progress[job_id] = (d.get("downloaded_bytes") or 0, total_bytes)
 
     ydl_opts["progress_hooks"].append(progress)
 
@@ -563,90 +901,152 @@ def do_download(job_id: str):
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             ydl.download([url])
 
-        jobs[job_id]["status"] = "finished"
-        jobs[job_id]["result"] = {"filename": os.path.basename(outpath), "path": outpath}
-        jobs[job_id]["progress"] = 100.0
+        with _dl_progress_lock:
+            _dl_progress.pop(job_id, None)
+            update_job(job_id, status="finished", result={"filename": os.path.basename(outpath), "path": outpath}, progress=100.0)
 
         if session_id:
-            session_folder = os.path.join(SESSIONS_DIR, session_id)
-            os.makedirs(session_folder, exist_ok=True)
-            shutil.copy(outpath, os.path.join(session_folder, os.path.basename(outpath)))
+            fast_copy(outpath, os.path.join(ensure_session_dir(session_id), os.path.basename(outpath)))
 
         push_job_update(job_id)
-        socketio.emit('videos_update', get_videos_list())  # Refresh videos list
+        emit_event('videos_update', get_videos_list())  # Refresh videos list
 
     except Exception as e:
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = str(e)
+        with _dl_progress_lock:
+            _dl_progress.pop(job_id, None)
+            update_job(job_id, status="error", error=str(e))
         push_job_update(job_id)
 
-# Job queue worker
-def job_worker():
+# Download progress: hooks store the latest (downloaded, total) per job and
+# this thread publishes it at most every DOWNLOAD_PROGRESS_INTERVAL seconds
+DOWNLOAD_PROGRESS_INTERVAL = 0.1
+_dl_progress: Dict[str, Tuple[int, int]] = {}
+_dl_progress_lock = threading.Lock()
+
+def _drain_download_progress():
     while True:
-        try:
-            job_id = job_queue.get(timeout=1)
-            job = jobs.get(job_id)
-            if not job:
-                continue
+        time.sleep(DOWNLOAD_PROGRESS_INTERVAL)
+        for job_id in list(_dl_progress):
+            # Held across the status check and the emits so a sample never lands after the final update
+            with _dl_progress_lock:
+                sample = _dl_progress.pop(job_id, None)
+                if sample is None or jobs[job_id].status != "running":
+                    continue
+                downloaded, total_bytes = sample
+                prog = round((downloaded / total_bytes * 100) if total_bytes else 0.0, 2)
+                update_job(job_id, progress=prog)
+                emit_event('download_progress', {"job_id": job_id, "progress": prog})
+                push_job_update(job_id)
+
+threading.Thread(target=_drain_download_progress, name="download-progress", daemon=True).start()
+
+# Job dispatch
+def enqueue_job(job_id: str):
+    kind = jobs[job_id].kind
+    executors[EXECUTOR_FOR_KIND.get(kind, "clip")].submit(run_job, job_id)
+
+def run_job(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        return
+
+    kind = job.kind
+    try:
+        if kind == "download":
+            do_download(job_id)
+        elif kind == "transcribe":
+            do_transcribe(job_id)
+        elif kind == "clip":
+            do_clip(job_id)
+        elif kind == "clip_template":
+            do_clip_with_template(job_id)
+        elif kind == "clip_batch":
+            do_clip_batch(job_id)
+        else:
+            update_job(job_id, status="error", error=f"unknown job kind: {kind}")
+            push_job_update(job_id)
+    except Exception as e:
+        update_job(job_id, status="error", error=str(e))
+        push_job_update(job_id)
 
-            kind = job["kind"]
+def report_clip_progress(job_id: str, secs: float, duration: float):
+    progress = round(min(100.0, (secs / duration) * 100.0), 2)
+    # Only publish steps of at least 1% to keep websocket traffic down
+    if progress - jobs[job_id].progress < 1.0:
+        return
+    update_job(job_id, progress=progress)
+    if push_job_update(job_id):
+        emit_event('clip_progress', {"job_id": job_id, "progress": progress})
+
+def run_ffmpeg(job_id: str, cmd: List[str], duration: float):
+    """Run an ffmpeg command, streaming its -progress output into the job"""
+    cmd = cmd[:1] + ["-progress", "pipe:1", "-nostats"] + cmd[1:]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=1, universal_newlines=True)
+    try:
+        for line in proc.stdout:
+            # key=value lines; out_time_us is the output position in microseconds
+            if line.startswith("out_time_us="):
+                value = line[12:].strip()
+                if value.isdigit():
+                    report_clip_progress(job_id, int(value) / 1e6, duration)
+        proc.wait()
+    except Exception:
+        proc.kill()
+        raise
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed with code {proc.returncode}")
+
+def run_encode(job_id: str, input_path: str, start: float, duration: float, vf_arg: str, outpath: str):
+    """Encode a clip in-process when enabled (INPROCESS_ENCODER=1), otherwise with the ffmpeg CLI"""
+    with encode_slots:
+        if INPROCESS_ENCODER:
             try:
-                if kind == "download":
-                    do_download(job_id)
-                elif kind == "transcribe":
-                    do_transcribe(job_id)
-                elif kind == "clip":
-                    do_clip(job_id)
-                elif kind == "clip_template":
-                    do_clip_with_template(job_id)
-                else:
-                    jobs[job_id]["status"] = "error"
-                    jobs[job_id]["error"] = f"unknown job kind: {kind}"
-                    push_job_update(job_id)
+                encoder_pool.encode_clip(
+                    input_path, start, duration, vf_arg, outpath,
+                    codec_name=HW_ENCODER or "libx264",
+                    on_progress=lambda secs: report_clip_progress(job_id, secs, duration)
+                )
+                return
             except Exception as e:
-                jobs[job_id]["status"] = "error"
-                jobs[job_id]["error"] = str(e)
-                push_job_update(job_id)
-            finally:
-                job_queue.task_done()
-        except:
-            continue
-
-# Start background worker
-worker_thread = threading.Thread(target=job_worker, daemon=True)
-worker_thread.start()
+                log(f"In-process encode failed, falling back to ffmpeg: {e}")
+        # The chain goes through a script file: no quoting on the command line and no ARG_MAX limit
+        filter_script = write_filter_script(vf_arg)
+        try:
+            run_ffmpeg(job_id, build_ffmpeg_cmd(input_path, start, duration, filter_script, outpath), duration)
+        finally:
+            os.remove(filter_script)
 
 def do_clip(job_id: str):
-    jobs[job_id]["status"] = "running"
+    update_job(job_id, status="running")
     push_job_update(job_id)
 
-    meta = jobs[job_id]["meta"]
+    meta = jobs[job_id].meta
     filename = meta["filename"]
     start = float(meta["start"])
     end = float(meta["end"])
     text = meta.get("text", "")
     flip = meta.get("flip", False)
+    vertical = meta.get("vertical", True)
+    exact_cut = meta.get("exact_cut", False)
     session_id = meta.get("session_id")
     output_name = meta.get("output_name") or f"clip_{int(time.time())}.mp4"
 
     input_path = os.path.join(DOWNLOADS_DIR, filename)
     if not os.path.exists(input_path):
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = "input file not found"
+        update_job(job_id, status="error", error="input file not found")
         push_job_update(job_id)
         return
 
     duration = end - start
     if duration <= 0:
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = "invalid start/end"
+        update_job(job_id, status="error", error="invalid start/end")
         push_job_update(job_id)
         return
 
     # Create video-specific folder
     video_name = os.path.splitext(filename)[0]  # Remove extension
     video_clips_dir = os.path.join(CLIPS_DIR, video_name)
-    os.makedirs(video_clips_dir, exist_ok=True)
+    ensure_dir(video_clips_dir)
 
     # Make filename unique with timestamp
     timestamp = int(time.time() * 1000)  # milliseconds for uniqueness
@@ -660,87 +1060,154 @@ def do_clip(job_id: str):
         vf_filters.append("hflip")
 
     if text:
-        safe_text = text.replace("'", "\\'")
-        vf = f"drawtext=text='{safe_text}':fontfile={DEFAULT_EMOJI_FONT}:fontcolor=white:fontsize=28:x=(w-text_w)/2:y=h-200:box=1:boxcolor=black@0.6:boxborderw=10"
+        safe_text = escape_drawtext_text(text)
+        vf = f"drawtext=text={safe_text}:fontfile={DEFAULT_EMOJI_FONT}:fontcolor=white:fontsize=28:x=(w-text_w)/2:y=h-200:box=1:boxcolor=black@0.6:boxborderw=10"
         vf_filters.append(vf)
 
-    vf_filters.append(vertical_filter())
-    vf_arg = ",".join(vf_filters)
-
-    cmd = [
-        "ffmpeg", "-y",
-        "-ss", str(start), "-i", input_path,
-        "-t", str(duration),
-        "-vf", vf_arg,
-        "-c:v", "libx264",
-        "-c:a", "aac",
-        outpath
-    ]
+    if vertical:
+        vf_filters.append(vertical_filter())
+    vf_arg = ",".join(vf_filters) or "null"
 
-    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, universal_newlines=True)
     try:
-        import re
-        while True:
-            line = proc.stderr.readline()
-            if not line:
-                break
-            if "time=" in line:
-                m = re.search(r"time=(\d+:\d+:\d+\.\d+)", line)
-                if m:
-                    secs = ffmpeg_time_to_secs(m.group(1))
-                    prog = (secs / duration) * 100.0
-                    jobs[job_id]["progress"] = round(min(100.0, prog), 2)
-                    jobs[job_id]["updated_at"] = time.time()
-                    socketio.emit('clip_progress', {"job_id": job_id, "progress": jobs[job_id]["progress"]})
-                    push_job_update(job_id)
-        proc.wait()
-        if proc.returncode != 0:
-            raise RuntimeError(f"ffmpeg failed with code {proc.returncode}")
+        result = {"clip_file": outpath}
+        with atomic_output(outpath) as tmp_path:
+            if not vf_filters and not exact_cut:
+                # Nothing to filter: copy the packets, no decode or encode
+                run_ffmpeg(job_id, build_copy_cmd(input_path, start, duration, tmp_path), duration)
+                result["warning"] = "stream copy: start snapped to the nearest keyframe (use exact_cut for a precise cut)"
+            else:
+                run_encode(job_id, input_path, start, duration, vf_arg, tmp_path)
 
-        jobs[job_id]["status"] = "finished"
-        jobs[job_id]["result"] = {"clip_file": outpath}
-        jobs[job_id]["progress"] = 100.0
+        update_job(job_id, status="finished", result=result, progress=100.0)
 
         # Store clip metadata
         video_name = os.path.splitext(filename)[0]
         clip_filename = os.path.basename(outpath)
         metadata_key = f"{video_name}/{clip_filename}"
-        clips_metadata[metadata_key] = {
+        register_clip(metadata_key, {
             "source_video": filename,
             "start": start,
             "end": end,
             "text": text,
             "created_at": time.time(),
             "path": outpath
-        }
+        })
 
         if session_id:
-            session_folder = os.path.join(SESSIONS_DIR, session_id)
-            os.makedirs(session_folder, exist_ok=True)
-            shutil.copy(outpath, os.path.join(session_folder, os.path.basename(outpath)))
+            fast_copy(outpath, os.path.join(ensure_session_dir(session_id), os.path.basename(outpath)))
 
         push_job_update(job_id)
 
     except Exception as e:
-        if proc:
-            proc.kill()
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = str(e)
+        update_job(job_id, status="error", error=str(e))
         push_job_update(job_id)
 
+def do_clip_batch(job_id: str):
+    update_job(job_id, status="running")
+    push_job_update(job_id)
+
+    meta = jobs[job_id].meta
+    filename = meta["filename"]
+    session_id = meta.get("session_id")
+
+    input_path = os.path.join(DOWNLOADS_DIR, filename)
+    if not os.path.exists(input_path):
+        update_job(job_id, status="error", error="input file not found")
+        push_job_update(job_id)
+        return
+
+    video_name = os.path.splitext(filename)[0]
+    video_clips_dir = os.path.join(CLIPS_DIR, video_name)
+    ensure_dir(video_clips_dir)
+
+    timestamp = int(time.time() * 1000)
+    clips = []
+    for i, clip in enumerate(meta["clips"]):
+        start = float(clip["start"])
+        end = float(clip["end"])
+        if end <= start:
+            update_job(job_id, status="error", error=f"invalid start/end for clip {i}")
+            push_job_update(job_id)
+            return
+
+        vf_filters = []
+        if clip.get("flip"):
+            vf_filters.append("hflip")
+        overlays = clip.get("overlays") or []
+        text = clip.get("text", "")
+        if overlays:
+            vf_filters.extend(generate_overlay_filter(overlays))
+        elif text:
+            safe_text = escape_drawtext_text(text)
+            vf_filters.append(f"drawtext=text={safe_text}:fontfile={DEFAULT_EMOJI_FONT}:fontcolor=white:fontsize=28:x=(w-text_w)/2:y=h-200:box=1:boxcolor=black@0.6:boxborderw=10")
+        vf_filters.append(vertical_filter())
+
+        output_name = clip.get("output_name") or f"clip_{int(time.time())}.mp4"
+        unique_output_name = f"{os.path.splitext(output_name)[0]}_{timestamp}_{i}.mp4"
+        clips.append({
+            "start": start,
+            "end": end,
+            "text": text,
+            "overlays": overlays,
+            "vf_arg": ",".join(vf_filters),
+            "outpath": os.path.join(video_clips_dir, unique_output_name)
+        })
+
+    base = min(c["start"] for c in clips)
+    filter_scripts = []
+    try:
+        for c in clips:
+            filter_scripts.append(write_filter_script(c["vf_arg"]))
+        # ffmpeg reports the furthest output position, so the longest clip sets the scale
+        longest = max(c["end"] - c["start"] for c in clips)
+        with ExitStack() as stack, encode_slots:
+            outputs = [
+                (c["start"], c["end"] - c["start"], script, stack.enter_context(atomic_output(c["outpath"])))
+                for c, script in zip(clips, filter_scripts)
+            ]
+            run_ffmpeg(job_id, build_batch_ffmpeg_cmd(input_path, base, outputs), longest)
+
+        update_job(job_id, status="finished", result={"clip_files": [c["outpath"] for c in clips]}, progress=100.0)
+
+        for c in clips:
+            clip_filename = os.path.basename(c["outpath"])
+            metadata = {
+                "source_video": filename,
+                "start": c["start"],
+                "end": c["end"],
+                "created_at": time.time(),
+                "path": c["outpath"]
+            }
+            if c["overlays"]:
+                metadata["overlays"] = c["overlays"]
+            else:
+                metadata["text"] = c["text"]
+            register_clip(f"{video_name}/{clip_filename}", metadata)
+
+            if session_id:
+                fast_copy(c["outpath"], os.path.join(ensure_session_dir(session_id), clip_filename))
+
+        push_job_update(job_id)
+
+    except Exception as e:
+        update_job(job_id, status="error", error=str(e))
+        push_job_update(job_id)
+    finally:
+        for script in filter_scripts:
+            os.remove(script)
+
 def do_clip_with_template(job_id: str):
-    jobs[job_id]["status"] = "running"
+    update_job(job_id, status="running")
     push_job_update(job_id)
 
-    meta = jobs[job_id]["meta"]
+    meta = jobs[job_id].meta
     filename = meta["filename"]
     template = meta["template"]
     session_id = meta.get("session_id")
 
     input_path = os.path.join(DOWNLOADS_DIR, filename)
     if not os.path.exists(input_path):
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = "input file not found"
+        update_job(job_id, status="error", error="input file not found")
         push_job_update(job_id)
         return
 
@@ -759,7 +1226,7 @@ def do_clip_with_template(job_id: str):
     # Create video-specific folder
     video_name = os.path.splitext(filename)[0]  # Remove extension
     video_clips_dir = os.path.join(CLIPS_DIR, video_name)
-    os.makedirs(video_clips_dir, exist_ok=True)
+    ensure_dir(video_clips_dir)
 
     outpath = os.path.join(video_clips_dir, output_name)
 
@@ -777,9 +1244,9 @@ def do_clip_with_template(job_id: str):
 
     # Backward compatibility - handle old single text field
     elif template.get("text"):
-        safe_text = template.get("text", "").replace("'", "\\'")
+        safe_text = escape_drawtext_text(template.get("text", ""))
         font_size = template.get("font_size", 28)
-        vf = f"drawtext=text='{safe_text}':fontfile={DEFAULT_EMOJI_FONT}:fontcolor=white:fontsize={font_size}:x=(w-text_w)/2:y=h-200:box=1:boxcolor=black@0.6:boxborderw=10"
+        vf = f"drawtext=text={safe_text}:fontfile={DEFAULT_EMOJI_FONT}:fontcolor=white:fontsize={font_size}:x=(w-text_w)/2:y=h-200:box=1:boxcolor=black@0.6:boxborderw=10"
         vf_filters.append(vf)
 
     # Apply resolution scaling if specified
@@ -795,45 +1262,17 @@ def do_clip_with_template(job_id: str):
 
     vf_arg = ",".join(vf_filters)
 
-    cmd = [
-        "ffmpeg", "-y",
-        "-ss", str(start), "-i", input_path,
-        "-t", str(duration),
-        "-vf", vf_arg,
-        "-c:v", "libx264",
-        "-c:a", "aac",
-        outpath
-    ]
-
-    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, universal_newlines=True)
     try:
-        import re
-        while True:
-            line = proc.stderr.readline()
-            if not line:
-                break
-            if "time=" in line:
-                m = re.search(r"time=(\d+:\d+:\d+\.\d+)", line)
-                if m:
-                    secs = ffmpeg_time_to_secs(m.group(1))
-                    prog = (secs / duration) * 100.0
-                    jobs[job_id]["progress"] = round(min(100.0, prog), 2)
-                    jobs[job_id]["updated_at"] = time.time()
-                    socketio.emit('clip_progress', {"job_id": job_id, "progress": jobs[job_id]["progress"]})
-                    push_job_update(job_id)
-        proc.wait()
-        if proc.returncode != 0:
-            raise RuntimeError(f"ffmpeg failed with code {proc.returncode}")
+        with atomic_output(outpath) as tmp_path:
+            run_encode(job_id, input_path, start, duration, vf_arg, tmp_path)
 
-        jobs[job_id]["status"] = "finished"
-        jobs[job_id]["result"] = {"clip_file": outpath, "template": template.get("name", "unknown")}
-        jobs[job_id]["progress"] = 100.0
+        update_job(job_id, status="finished", result={"clip_file": outpath, "template": template.get("name", "unknown")}, progress=100.0)
 
         # Store clip metadata
         video_name = os.path.splitext(filename)[0]
         clip_filename = os.path.basename(outpath)
         metadata_key = f"{video_name}/{clip_filename}"
-        clips_metadata[metadata_key] = {
+        register_clip(metadata_key, {
             "source_video": filename,
             "start": start,
             "end": end,
@@ -841,143 +1280,275 @@ def do_clip_with_template(job_id: str):
             "template": template.get("name", "unknown"),
             "created_at": time.time(),
             "path": outpath
-        }
+        })
 
         if session_id:
-            session_folder = os.path.join(SESSIONS_DIR, session_id)
-            os.makedirs(session_folder, exist_ok=True)
-            shutil.copy(outpath, os.path.join(session_folder, os.path.basename(outpath)))
+            fast_copy(outpath, os.path.join(ensure_session_dir(session_id), os.path.basename(outpath)))
 
         push_job_update(job_id)
 
     except Exception as e:
-        if proc:
-            proc.kill()
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = str(e)
+        update_job(job_id, status="error", error=str(e))
         push_job_update(job_id)
 
-def get_videos_list():
-    videos_list = []
-    if os.path.exists(DOWNLOADS_DIR):
-        for file in os.listdir(DOWNLOADS_DIR):
-            if file.endswith('.mp4'):
-                path = os.path.join(DOWNLOADS_DIR, file)
-                title = os.path.splitext(file)[0]
-                videos_list.append({"title": title, "path": path})
+# downloads dir path -> (dir mtime_ns, videos list); rebuilt only when the directory changes
+_videos_cache: Dict[str, Tuple[int, List[dict]]] = {}
+
+def scan_videos(downloads_dir: str) -> List[dict]:
+    """List .mp4 files in downloads_dir as {"title", "path"}, cached on the dir mtime"""
+    try:
+        mtime = os.stat(downloads_dir).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    cached = _videos_cache.get(downloads_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with os.scandir(downloads_dir) as it:
+        videos_list = [
+            {"title": entry.name[:-4], "path": os.path.join(downloads_dir, entry.name)}  # title: filename without .mp4
+            for entry in it if entry.name.endswith('.mp4')
+        ]
+    _videos_cache[downloads_dir] = (mtime, videos_list)
     return videos_list
 
-def ensure_whisper_model():
-    global whisper_model
-    if whisper_model is None and WHISPER_AVAILABLE:
-        device = "cuda" if os.getenv("USE_CUDA", "0") == "1" else "cpu"
-        compute_type = "int8_float16" if device == "cuda" else "float32"
-        model_name = os.getenv("WHISPER_MODEL", "small")
-        whisper_model = WhisperModel(model_name, device=device, compute_type=compute_type)
-    return whisper_model
+def get_videos_list():
+    return scan_videos(DOWNLOADS_DIR)
+
+# Multilingual default: most source videos are Tamil. English-only jobs use a
+# distilled checkpoint, which has a much smaller decoder for similar accuracy.
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")
+WHISPER_EN_MODEL = os.getenv("WHISPER_EN_MODEL", "distil-small.en")
+_model_lock = threading.Lock()
+
+def whisper_model_name(language: Optional[str]) -> str:
+    return WHISPER_EN_MODEL if language == "en" and WHISPER_EN_MODEL else WHISPER_MODEL
+
+def ensure_whisper_model(model_name: str = WHISPER_MODEL):
+    """Return the shared batched Whisper pipeline for model_name, loading it on first use"""
+    model = batched_models.get(model_name)
+    if model is None and WHISPER_AVAILABLE:
+        with _model_lock:
+            model = batched_models.get(model_name)
+            if model is None:
+                # One ctranslate2 worker per transcribe thread so concurrent jobs run in parallel
+                whisper_models[model_name] = WhisperModel(**whisper_model_kwargs(model_name, TRANSCRIBE_WORKERS))
+                model = batched_models[model_name] = BatchedInferencePipeline(model=whisper_models[model_name])
+    return model
+
+def whisper_model_kwargs(model_name: str, workers: int) -> dict:
+    """WhisperModel arguments for a process that runs `workers` concurrent transcriptions"""
+    device = WHISPER_DEVICE
+    return {
+        "model_size_or_path": model_name,
+        "device": device,
+        "compute_type": os.getenv("WHISPER_COMPUTE", "int8_float16" if device == "cuda" else "int8"),
+        # Split the cores between workers instead of letting each one claim all of them
+        "cpu_threads": int(os.getenv("WHISPER_CPU_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))),
+        "num_workers": workers,
+    }
+
+# Optional process pool for transcription (WHISPER_PROCESSES > 0). Each process
+# keeps its own model; the transcribe threads only relay segments from a queue.
+WHISPER_PROCESSES = int(os.getenv("WHISPER_PROCESSES", "0"))
+_transcribe_pool = None
+_transcribe_manager = None
+
+def _get_transcribe_pool():
+    global _transcribe_pool, _transcribe_manager
+    with _model_lock:
+        if _transcribe_pool is None:
+            # spawn, not fork: the server process has threads and may hold a CUDA context
+            ctx = multiprocessing.get_context("spawn")
+            _transcribe_manager = ctx.Manager()
+            _transcribe_pool = ProcessPoolExecutor(max_workers=WHISPER_PROCESSES, mp_context=ctx)
+    return _transcribe_pool, _transcribe_manager
+
+def transcribe_segments(path: str, language):
+    """Yield segments (start, end, text) for path, in this process or the process pool"""
+    model_name = whisper_model_name(language)
+    if not WHISPER_PROCESSES:
+        segments, _info = ensure_whisper_model(model_name).transcribe(
+            path, batch_size=WHISPER_BATCH_SIZE, beam_size=5, language=language,
+            vad_filter=True, word_timestamps=False
+        )
+        yield from segments
+        return
+
+    pool, manager = _get_transcribe_pool()
+    segment_queue = manager.Queue()
+    future = pool.submit(
+        transcribe_worker.transcribe, path, language, WHISPER_BATCH_SIZE,
+        whisper_model_kwargs(model_name, 1), segment_queue
+    )
+    while True:
+        try:
+            segment = segment_queue.get(timeout=1.0)
+        except queue.Empty:
+            if future.done():
+                break
+            continue
+        if segment is None:
+            break
+        yield segment
+    future.result()  # re-raise a failure from the worker
+
+def warmup_whisper_model():
+    """Run one second of silence through the model so the first job skips kernel setup.
+    Failures are only logged: ensure_whisper_model retries the load on the first job."""
+    try:
+        if WHISPER_PROCESSES or ensure_whisper_model() is None:
+            return
+        import numpy as np
+        segments, _info = whisper_models[WHISPER_MODEL].transcribe(np.zeros(16000, dtype=np.float32), language="en", vad_filter=False)
+        for _ in segments:
+            pass
+    except Exception as e:
+        log(f"Whisper warmup failed: {e}")
+
+def media_duration(path: str) -> Optional[float]:
+    """Duration in seconds from the MP4 header, else from the container via PyAV"""
+    if MP4 is not None:
+        try:
+            return MP4(path).info.length
+        except Exception:
+            pass
+    if av is not None:
+        try:
+            with av.open(path) as container:
+                return container.duration / av.time_base if container.duration else None
+        except Exception:
+            pass
+    return None
+
+SEGMENT_BATCH_SIZE = 8
+SEGMENT_FLUSH_INTERVAL = 0.25
 
 def do_transcribe(job_id: str):
     if not WHISPER_AVAILABLE:
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = "faster-whisper not available"
+        update_job(job_id, status="error", error="faster-whisper not available")
         push_job_update(job_id)
         return
 
-    jobs[job_id]["status"] = "running"
+    update_job(job_id, status="running")
     push_job_update(job_id)
 
-    filename = jobs[job_id]["meta"]["filename"]
-    session_id = jobs[job_id]["meta"].get("session_id")
+    filename = jobs[job_id].meta["filename"]
+    session_id = jobs[job_id].meta.get("session_id")
+    language = jobs[job_id].meta.get("language")
     path = os.path.join(DOWNLOADS_DIR, filename)
 
     if not os.path.exists(path):
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = "file not found"
+        update_job(job_id, status="error", error="file not found")
         push_job_update(job_id)
         return
 
-    model = ensure_whisper_model()
-
-    # Get duration
-    try:
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-             "-of", "default=noprint_wrappers=1:nokey=1", path],
-            capture_output=True, text=True, check=True
-        )
-        total_duration = float(result.stdout.strip()) if result.stdout else None
-    except:
-        total_duration = None
+    total_duration = media_duration(path)
 
-    transcription_lines = []
-    jobs[job_id]["progress"] = 0.0
+    update_job(job_id, progress=0.0)
     push_job_update(job_id)
 
+    out = None
+    outfile = os.path.join(TRANS_DIR, f"{filename}.txt")
+    # Lines are written as segments arrive, into a new file that is renamed into
+    # place at the end, so session links to an earlier transcript keep their content
+    tmpfile = f"{outfile}.{uuid.uuid4().hex[:8]}.tmp"
     try:
-        segments_iter = model.transcribe(path, beam_size=5, word_timestamps=False)
+        # Passing a known language skips the detection pass
+        segments_iter = transcribe_segments(path, language)
+        out = open(tmpfile, "w", encoding="utf-8", buffering=1 << 16)
+        preview = ""
         processed_time = 0.0
-
-        for segment in segments_iter:
-            segs = segment if isinstance(segment, list) else [segment]
-            for s in segs:
-                start = s.get("start", 0.0)
-                end = s.get("end", start)
-                text = s.get("text") or s.get("transcript") or ""
-                transcription_lines.append(f"[{start:0.2f}] {text}")
-
-                socketio.emit('transcript_segment', {
-                    "job_id": job_id,
-                    "segment": {"start": start, "end": end, "text": text}
-                })
-
-                processed_time = max(processed_time, end)
-
-            if total_duration:
-                jobs[job_id]["progress"] = round(min(100.0, (processed_time / total_duration) * 100.0), 2)
+        # Segments go out in batches of SEGMENT_BATCH_SIZE or every SEGMENT_FLUSH_INTERVAL seconds
+        pending = []
+        last_flush = time.monotonic()
+
+        pct_per_sec = 100.0 / total_duration if total_duration else None
+
+        def flush_segments():
+            emit_event('transcript_segments_batch', {"job_id": job_id, "segments": pending[:]})
+            pending.clear()
+            current = jobs[job_id].progress
+            if pct_per_sec:
+                pct = processed_time * pct_per_sec
+                if pct > 100.0:
+                    pct = 100.0
             else:
-                jobs[job_id]["progress"] = min(99.0, jobs[job_id]["progress"] + 5.0)
-            jobs[job_id]["updated_at"] = time.time()
-            push_job_update(job_id)
+                pct = min(99.0, current + 5.0)
+            # Sub-half-percent moves are not worth a job update
+            if pct - current >= 0.5:
+                update_job(job_id, progress=pct)
+                push_job_update(job_id)
 
-        final_text = "\n".join(transcription_lines).strip()
-        outfile = os.path.join(TRANS_DIR, f"{filename}.txt")
-        with open(outfile, "w", encoding="utf-8") as f:
-            f.write(final_text)
+        for segment in segments_iter:
+            start = segment.start
+            end = segment.end
+            text = segment.text
+            line = f"[{start:0.2f}] {text}\n"
+            out.write(line)
+            if len(preview) < 400:
+                preview += line
+            pending.append({"start": start, "end": end, "text": text})
+            processed_time = max(processed_time, end)
+
+            now = time.monotonic()
+            if len(pending) >= SEGMENT_BATCH_SIZE or now - last_flush > SEGMENT_FLUSH_INTERVAL:
+                flush_segments()
+                last_flush = now
+        if pending:
+            flush_segments()
+
+        out.close()
+        os.replace(tmpfile, outfile)
 
         if session_id:
-            session_folder = os.path.join(SESSIONS_DIR, session_id)
-            os.makedirs(session_folder, exist_ok=True)
-            shutil.copy(outfile, os.path.join(session_folder, os.path.basename(outfile)))
+            fast_copy(outfile, os.path.join(ensure_session_dir(session_id), os.path.basename(outfile)))
 
-        jobs[job_id]["status"] = "finished"
-        jobs[job_id]["result"] = {"transcript_file": outfile, "text_preview": final_text[:400]}
-        jobs[job_id]["progress"] = 100.0
+        update_job(job_id, status="finished", result={"transcript_file": outfile, "text_preview": preview.strip()[:400]}, progress=100.0)
         push_job_update(job_id)
 
     except Exception as e:
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = str(e)
+        update_job(job_id, status="error", error=str(e))
         push_job_update(job_id)
+    finally:
+        if out is not None:
+            out.close()
+        # Only left behind when the job failed before the rename
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)
+
+# Media delivery. Standalone, werkzeug streams files through the server's
+# wsgi.file_wrapper (sendfile where supported) with Range support. Behind a
+# proxy, USE_X_SENDFILE=1 (Apache/lighttpd) or X_ACCEL_PREFIX (nginx, e.g.
+# "/internal/" with `location /internal/ { internal; alias /path/to/app/; }`)
+# hands the transfer to the proxy so Python never touches the bytes.
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "0") == "1"
+X_ACCEL_PREFIX = os.getenv("X_ACCEL_PREFIX")
+
+def send_media(directory: str, path: str):
+    if X_ACCEL_PREFIX:
+        file_path = safe_join(directory, path)
+        if file_path is None or not os.path.isfile(file_path):
+            abort(404)
+        response = app.response_class(mimetype=mimetypes.guess_type(file_path)[0] or "application/octet-stream")
+        response.headers["X-Accel-Redirect"] = X_ACCEL_PREFIX.rstrip("/") + "/" + file_path.replace(os.sep, "/")
+        return response
+    return send_from_directory(directory, path, conditional=True)
 
 @app.route('/video/<filename>')
 def get_video_file(filename):
-    return send_from_directory('downloads', filename)
+    return send_media(DOWNLOADS_DIR, filename)
 
 @app.route('/clips/<path:filepath>')
 def get_clip_file(filepath):
-    # filepath can be "video_name/clip_file.mp4"
-    parts = filepath.split('/', 1)
-    if len(parts) == 2:
-        folder, filename = parts
-        return send_from_directory(os.path.join('clips', folder), filename)
-    else:
-        # Legacy support for clips directly in clips folder
-        return send_from_directory('clips', filepath)
+    # filepath can be "video_name/clip_file.mp4" or a legacy clip directly in the clips folder
+    return send_media(CLIPS_DIR, filepath)
 
 @app.route('/transcripts/<filename>')
 def get_transcript_file(filename):
-    return send_from_directory('transcripts', filename)
+    return send_media(TRANS_DIR, filename)
 
 if __name__ == '__main__':
-    load_templates()  # Load templates on startup
-    socketio.run(app, port=14562)
\ No newline at end of file
+    # Keep one warm model for all transcribe jobs, loaded off the startup path
+    threading.Thread(target=warmup_whisper_model, name="whisper-warmup", daemon=True).start()
+    # One worker: job state lives in this process. loop="auto" picks uvloop when installed
+    uvicorn.run(asgi_app, host="127.0.0.1", port=14562, loop="auto")
\ No newline at end of file
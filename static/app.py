@@ -3,19 +3,27 @@ import os
 import time
 import uuid
 import asyncio
-import subprocess
+import json
+import functools
 import shutil
-from typing import Dict, Any, List, Optional
+import subprocess
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Protocol, Tuple
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from faster_whisper import WhisperModel
+from faster_whisper import WhisperModel, BatchedInferencePipeline
 import yt_dlp
+import orjson
+import ctranslate2
 
 # IMPORT utilities (templating helpers etc.)
-from utils.video_tools import uuid_name  # small helper used below
+from utils.video_tools import (
+    uuid_name, detect_hw_encoder, hw_input_args, encode_args, probe_video, needs_vertical_reframe,
+    cuvid_decoders, render_text_png, mp4_duration
+)
 
 # -----------------------
 # CONFIG / PATHS
@@ -37,6 +45,13 @@ os.makedirs(SESSIONS_DIR, exist_ok=True)
 os.makedirs(STATIC_DIR, exist_ok=True)
 os.makedirs(FONTS_DIR, exist_ok=True)
 
+# NVENC/QSV/VAAPI encoder probed once at startup; None means libx264 on the CPU
+HW_ENCODER = detect_hw_encoder()
+# libavfilter thread pool size for the template filter graphs
+FILTER_THREADS = str(os.cpu_count() or 1)
+# NVDEC decoders usable for decoder-side crop/resize (same GPU as NVENC)
+CUVID_DECODERS = cuvid_decoders() if HW_ENCODER == "h264_nvenc" else {}
+
 # Use the uploaded logo path from your session (will be transformed to a served URL).
 LOGO_PATH = r'/mnt/data/A_logo_for_"Tamil_Scoop"_is_set_against_a_textured.png'
 
@@ -48,7 +63,10 @@ app = FastAPI(title="TamilScoop - full pipeline (faster-whisper)")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 job_queue: asyncio.Queue = asyncio.Queue()
-jobs: Dict[str, Dict[str, Any]] = {}  # job_id -> job state
+# job_id -> job state, oldest first; finished jobs are evicted past MAX_JOBS or after JOB_TTL
+jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+MAX_JOBS = int(os.getenv("MAX_JOBS", "1000"))
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
 
 # -----------------------
 # WebSocket manager
@@ -66,10 +84,12 @@ class ConnectionManager:
             self.active.remove(ws)
 
     async def broadcast(self, message: dict):
+        # serialise once for every client; orjson is a C encoder
+        data = orjson.dumps(message)
         living = []
         for ws in list(self.active):
             try:
-                await ws.send_json(message)
+                await ws.send_bytes(data)
                 living.append(ws)
             except Exception:
                 try:
@@ -123,7 +143,42 @@ class CleanupRequest(BaseModel):
 # -----------------------
 def vertical_filter():
     # 9:16 center crop then scale to 1080x1920
-    return "crop=in_h*9/16:in_h:(in_w-(in_h*9/16))/2:0,scale=1080:1920"
+    return "crop=in_h*9/16:in_h:(in_w-(in_h*9/16))/2:0,scale=1080:1920:flags=fast_bilinear"
+
+def vertical_filter_args(info: dict) -> Tuple[List[str], Optional[str]]:
+    """(input args, -vf chain) that reframe a probed landscape video to 1080x1920.
+    With NVDEC the decoder crops and resizes, so full frames never reach the CPU filters."""
+    w, h = info.get("width"), info.get("height")
+    cuvid = CUVID_DECODERS.get(info.get("codec_name"))
+    if cuvid and w and h and w * 16 > h * 9:
+        crop_w = int(h * 9 / 16) // 2 * 2
+        left = (w - crop_w) // 2
+        # -crop is top x bottom x left x right in source pixels
+        return ["-c:v", cuvid, "-crop", f"0x0x{left}x{w - crop_w - left}", "-resize", "1080x1920"], None
+    return hw_input_args(HW_ENCODER), vertical_filter()
+
+def _link_or_copy(src: str, dst: str):
+    """Hardlink src to dst (no bytes moved); sendfile/copy when on another filesystem"""
+    if os.path.lexists(dst):
+        # never write through an old hardlink to the same inode
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    if not hasattr(os, "sendfile"):
+        shutil.copyfile(src, dst)
+        return
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        while remaining > 0:
+            sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, remaining)
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
 
 def create_job(kind: str, meta: dict):
     job_id = str(uuid.uuid4())
@@ -138,23 +193,179 @@ def create_job(kind: str, meta: dict):
         "result": None,
         "error": None
     }
+    evict_jobs()
     return job_id
 
-async def push_job_update(job_id: str):
+def evict_jobs():
+    """Drop the oldest finished/errored jobs while the table is over MAX_JOBS"""
+    while len(jobs) > MAX_JOBS:
+        done = next((k for k, j in jobs.items() if j["status"] in ("finished", "error")), None)
+        if done is None:
+            return  # everything left is queued or running
+        del jobs[done]
+
+async def sweep_jobs():
+    """Every 5 minutes forget jobs that ended more than JOB_TTL seconds ago"""
+    while True:
+        await asyncio.sleep(300)
+        cutoff = time.time() - JOB_TTL
+        for k in list(jobs):
+            j = jobs[k]
+            if j["status"] in ("finished", "error") and j["updated_at"] < cutoff:
+                del jobs[k]
+
+# progress pushes per job are capped to one per PROGRESS_INTERVAL seconds
+PROGRESS_INTERVAL = 0.2
+_last_push: Dict[str, float] = {}
+
+def progress_due(job_id: str) -> bool:
+    """True (and restart the interval) if job_id may send another progress update"""
+    now = time.monotonic()
+    if now - _last_push.get(job_id, 0.0) < PROGRESS_INTERVAL:
+        return False
+    _last_push[job_id] = now
+    return True
+
+async def push_job_update(job_id: str, force: bool = False):
     state = jobs.get(job_id, {})
+    status = state.get("status")
+    # only progress while running is throttled; status transitions always go out
+    if status == "running" and not force and not progress_due(job_id):
+        return
+    if status in ("finished", "error"):
+        _last_push.pop(job_id, None)
+    # template JSON can be large and clients never read it back; send a shallow view
+    meta = state.get("meta")
+    if meta and "template" in meta:
+        state = {**state, "meta": {k: v for k, v in meta.items() if k != "template"}}
     await manager.broadcast({"type": "job_update", "job": state})
 
 # -----------------------
 # Whisper model (lazy)
 # -----------------------
+def detect_whisper_device():
+    """Pick (device, compute_type) for faster-whisper from what CTranslate2 can see"""
+    try:
+        if ctranslate2.get_cuda_device_count() > 0:
+            # bfloat16 support means compute capability >= 8.0 (Ampere+): fast fp16 tensor cores
+            if "bfloat16" in ctranslate2.get_supported_compute_types("cuda"):
+                return "cuda", "float16"
+            return "cuda", "int8_float16"
+    except Exception:
+        pass
+    # INT8 weights on CPU (VNNI kernels, a third of the memory)
+    return "cpu", "int8"
+
+WHISPER_DEVICE, WHISPER_COMPUTE_TYPE = detect_whisper_device()
 WHISPER_MODEL = None
-async def ensure_model_loaded(model_name: str = "small", device: str = "cpu"):
-    global WHISPER_MODEL
-    if WHISPER_MODEL is None:
-        # compute_type chosen for CPU by default; change to int8_float16 for GPU as needed
-        compute_type = "float32" if device == "cpu" else "int8_float16"
-        WHISPER_MODEL = WhisperModel(model_name, device=device, compute_type=compute_type)
-    return WHISPER_MODEL
+BATCHED_PIPELINE = None
+WHISPER_BATCH = int(os.getenv("WHISPER_BATCH", "16"))
+# large-v3-turbo: multilingual (Tamil uploads), 4 decoder layers instead of 32
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", "large-v3-turbo")
+# one load at a time; concurrent transcribe jobs wait for the same model
+_MODEL_LOCK = asyncio.Lock()
+
+async def ensure_model_loaded(model_name: str = WHISPER_MODEL_NAME, device: str = WHISPER_DEVICE,
+                              compute_type: str = WHISPER_COMPUTE_TYPE):
+    global WHISPER_MODEL, BATCHED_PIPELINE
+    async with _MODEL_LOCK:
+        if WHISPER_MODEL is None:
+            # download + load off the event loop
+            WHISPER_MODEL = await asyncio.to_thread(
+                WhisperModel, model_name, device=device, compute_type=compute_type,
+                cpu_threads=os.cpu_count() or 4, num_workers=1
+            )
+            # decodes several VAD chunks per forward pass instead of one at a time
+            BATCHED_PIPELINE = BatchedInferencePipeline(model=WHISPER_MODEL)
+    return BATCHED_PIPELINE
+
+# -----------------------
+# Whisper backends (WHISPER_BACKEND=faster-whisper | openvino)
+# -----------------------
+class WhisperBackend(Protocol):
+    async def load(self) -> None: ...
+    def transcribe(self, path: str) -> Iterator[Dict[str, Any]]:
+        """Yield {"start", "end", "text"} dicts in order; blocking, callers pull it off the event loop"""
+        ...
+
+class FasterWhisperBackend:
+    """faster-whisper (CTranslate2) batched pipeline; the default"""
+    def __init__(self):
+        self.pipeline = None
+
+    async def load(self):
+        self.pipeline = await ensure_model_loaded()
+
+    def transcribe(self, path: str) -> Iterator[Dict[str, Any]]:
+        # greedy decoding, speech chunks from Silero VAD are decoded WHISPER_BATCH
+        # at a time (segments still arrive in order)
+        segments, _info = self.pipeline.transcribe(
+            path, batch_size=WHISPER_BATCH, beam_size=1, word_timestamps=False,
+            vad_filter=True, vad_parameters=dict(min_silence_duration_ms=500)
+        )
+        for segment in segments:
+            yield {"start": segment.start, "end": segment.end, "text": segment.text}
+
+class OpenVINOBackend:
+    """NNCF int8 Whisper on OpenVINO (optimum-intel); for CPU-only boxes with VNNI"""
+    WINDOW_S = 30
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_id: str = os.getenv("OV_WHISPER_MODEL", "openai/whisper-small")):
+        self.model_id = model_id
+        self.pipe = None
+        self._lock = asyncio.Lock()
+
+    def _build(self):
+        from optimum.intel.openvino import OVModelForSpeechSeq2Seq
+        from transformers import AutoProcessor, pipeline
+        # export=True converts to OpenVINO IR on first load; load_in_8bit quantises weights
+        model = OVModelForSpeechSeq2Seq.from_pretrained(self.model_id, export=True, load_in_8bit=True)
+        processor = AutoProcessor.from_pretrained(self.model_id)
+        return pipeline(
+            "automatic-speech-recognition", model=model,
+            tokenizer=processor.tokenizer, feature_extractor=processor.feature_extractor,
+            chunk_length_s=30
+        )
+
+    async def load(self):
+        async with self._lock:
+            if self.pipe is None:
+                self.pipe = await asyncio.to_thread(self._build)
+
+    def _audio_windows(self, path: str) -> Iterator[Any]:
+        """16 kHz mono float32 audio of path, WINDOW_S seconds at a time, decoded by ffmpeg as it goes"""
+        import numpy as np
+        window_bytes = self.WINDOW_S * self.SAMPLE_RATE * 4
+        proc = subprocess.Popen(
+            ["ffmpeg", "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", str(self.SAMPLE_RATE), "-f", "f32le", "-"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE
+        )
+        try:
+            while True:
+                buf = proc.stdout.read(window_bytes)
+                if not buf:
+                    break
+                yield np.frombuffer(buf[:len(buf) // 4 * 4], dtype=np.float32)
+        finally:
+            proc.stdout.close()
+            proc.kill()
+            proc.wait()
+
+    def transcribe(self, path: str) -> Iterator[Dict[str, Any]]:
+        # one pipeline call per window, so segments stream out while the rest is still decoding
+        # (a word spanning a window edge may be split)
+        offset = 0.0
+        for audio in self._audio_windows(path):
+            result = self.pipe({"raw": audio, "sampling_rate": self.SAMPLE_RATE}, return_timestamps=True)
+            for chunk in result.get("chunks", []):
+                start, end = chunk["timestamp"]
+                start = offset + (start or 0.0)
+                yield {"start": start, "end": offset + end if end is not None else start, "text": chunk["text"]}
+            offset += len(audio) / self.SAMPLE_RATE
+
+WHISPER_BACKENDS = {"faster-whisper": FasterWhisperBackend, "openvino": OpenVINOBackend}
+whisper_backend: WhisperBackend = WHISPER_BACKENDS[os.getenv("WHISPER_BACKEND", "faster-whisper")]()
 
 # -----------------------
 # Worker functions
@@ -177,10 +388,26 @@ async def do_download(job_id: str):
         "progress_hooks": []
     }
 
+    # progress messages go through a small bounded queue drained by one task;
+    # when the clients fall behind, updates are dropped instead of piling up tasks
+    loop = asyncio.get_running_loop()
+    progress_q: asyncio.Queue = asyncio.Queue(maxsize=4)
+
+    def offer(payload: dict):
+        try:
+            progress_q.put_nowait(payload)
+        except asyncio.QueueFull:
+            pass
+
+    async def drain_progress():
+        while True:
+            payload = await progress_q.get()
+            if payload is None:
+                return
+            await manager.broadcast(payload)
+            await push_job_update(job_id, force=True)
+
     def progress(d):
-        if d.get("status") == "downloading":
-            total = d.get("total_bytes", None)  # ignore weird keys
-        # fallback safe approach using available keys
         if d.get("status") == "downloading":
             total_bytes = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
             downloaded = d.get("downloaded_bytes") or 0
@@ -188,19 +415,28 @@ async def do_download(job_id: str):
             jobs[job_id]["progress"] = round(prog * 100, 2)
             jobs[job_id]["updated_at"] = time.time()
             # small broadcast
-            asyncio.create_task(manager.broadcast({"type":"download_progress","job_id":job_id,"progress":jobs[job_id]["progress"]}))
-            asyncio.create_task(push_job_update(job_id))
+            if progress_due(job_id):
+                loop.call_soon_threadsafe(offer, {"type":"download_progress","job_id":job_id,"progress":jobs[job_id]["progress"]})
         elif d.get("status") == "finished":
             jobs[job_id]["progress"] = 100.0
             jobs[job_id]["updated_at"] = time.time()
-            asyncio.create_task(push_job_update(job_id))
+            loop.call_soon_threadsafe(offer, {"type":"download_progress","job_id":job_id,"progress":100.0})
 
     ydl_opts["progress_hooks"].append(progress)
 
-    try:
+    def run_download():
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             ydl.download([url])
 
+    drainer = asyncio.create_task(drain_progress())
+    try:
+        try:
+            # network + disk I/O on a worker thread; the hook posts back via call_soon_threadsafe
+            await asyncio.to_thread(run_download)
+        finally:
+            await progress_q.put(None)
+            await drainer
+
         jobs[job_id]["status"] = "finished"
         jobs[job_id]["result"] = {"filename": os.path.basename(outpath), "path": outpath}
         jobs[job_id]["progress"] = 100.0
@@ -210,7 +446,7 @@ async def do_download(job_id: str):
             session_folder = os.path.join(SESSIONS_DIR, session_id)
             os.makedirs(session_folder, exist_ok=True)
             try:
-                shutil.copy(outpath, os.path.join(session_folder, os.path.basename(outpath)))
+                _link_or_copy(outpath, os.path.join(session_folder, os.path.basename(outpath)))
             except Exception:
                 pass
         await push_job_update(job_id)
@@ -233,50 +469,37 @@ async def do_transcribe(job_id: str):
         await push_job_update(job_id)
         return
 
-    # detect device
-    device = "cpu"
-    if os.getenv("USE_CUDA", "0") == "1":
-        device = "cuda"
-
-    model_name = os.getenv("WHISPER_MODEL", "small")
-    model = await ensure_model_loaded(model_name=model_name, device=device)
+    await whisper_backend.load()
 
-    # get duration (ffprobe)
-    try:
-        out = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-             "-of", "default=noprint_wrappers=1:nokey=1", path],
-            capture_output=True, text=True, check=True
-        )
-        total_duration = float(out.stdout.strip()) if out.stdout else None
-    except Exception:
-        total_duration = None
+    # get duration (mvhd header, ffprobe for non-MP4 containers)
+    total_duration = await asyncio.to_thread(mp4_duration, path)
 
     transcription_lines = []
     jobs[job_id]["progress"] = 0.0
     await push_job_update(job_id)
 
     try:
-        # generator from faster-whisper
-        segments_iter = model.transcribe(path, beam_size=5, word_timestamps=False)
-
         processed_time = 0.0
-        for segment in segments_iter:
-            segs = segment if isinstance(segment, list) else [segment]
-            for s in segs:
-                start = s.get("start", 0.0)
-                end = s.get("end", start)
-                text = s.get("text") or s.get("transcript") or ""
-                transcription_lines.append(f"[{start:0.2f}] {text}")
-
-                # send immediate segment message to UI
-                await manager.broadcast({
-                    "type": "transcript_segment",
-                    "job_id": job_id,
-                    "segment": {"start": start, "end": end, "text": text}
-                })
-
-                processed_time = max(processed_time, end)
+        # each next() decodes a batch of VAD chunks: pull them in a thread so sends,
+        # requests and ffmpeg progress readers keep running meanwhile
+        segments = whisper_backend.transcribe(path)
+        while True:
+            segment = await asyncio.to_thread(next, segments, None)
+            if segment is None:
+                break
+            start = segment["start"]
+            end = segment["end"]
+            text = segment["text"]
+            transcription_lines.append(f"[{start:0.2f}] {text}")
+
+            # send immediate segment message to UI
+            await manager.broadcast({
+                "type": "transcript_segment",
+                "job_id": job_id,
+                "segment": {"start": start, "end": end, "text": text}
+            })
+
+            processed_time = max(processed_time, end)
 
             # update progress
             if total_duration:
@@ -288,14 +511,21 @@ async def do_transcribe(job_id: str):
 
         final_text = "\n".join(transcription_lines).strip()
         outfile = os.path.join(TRANS_DIR, f"{filename}.txt")
-        with open(outfile, "w", encoding="utf-8") as f:
-            f.write(final_text)
+        # write a temp file and rename it over outfile: sessions may hardlink the old transcript
+        tmpfile = f"{outfile}.{uuid.uuid4().hex}.part"
+        try:
+            with open(tmpfile, "w", encoding="utf-8") as f:
+                f.write(final_text)
+            os.replace(tmpfile, outfile)
+        finally:
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
 
         # copy transcript to session folder if given
         if session_id:
             session_folder = os.path.join(SESSIONS_DIR, session_id)
             os.makedirs(session_folder, exist_ok=True)
-            shutil.copy(outfile, os.path.join(session_folder, os.path.basename(outfile)))
+            _link_or_copy(outfile, os.path.join(session_folder, os.path.basename(outfile)))
 
         jobs[job_id]["status"] = "finished"
         jobs[job_id]["result"] = {"transcript_file": outfile, "text_preview": final_text[:400]}
@@ -309,14 +539,50 @@ async def do_transcribe(job_id: str):
         jobs[job_id]["updated_at"] = time.time()
         await push_job_update(job_id)
 
-# Helper to parse ffmpeg time string HH:MM:SS.xx -> seconds
-def ffmpeg_time_to_secs(timestr: str) -> float:
+async def run_ffmpeg_progress(cmd: List[str], total_duration: float, job_id: str, msg_type: str):
+    """
+    Run ffmpeg as an asyncio subprocess, broadcasting msg_type progress from its -progress output.
+    The output (cmd's last arg) is written under a temp name and renamed into place on success,
+    so session hardlinks of an earlier render with the same name keep their own inode.
+    """
+    outpath = cmd[-1]
+    root, ext = os.path.splitext(outpath)
+    tmp_path = f"{root}.{uuid.uuid4().hex}.part{ext}"
+    # -progress writes key=value lines to stdout; out_time_us is the position in microseconds
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats"] + cmd[1:-1] + [tmp_path]
+    # stdin closed so ffmpeg never waits on (or steals) terminal input; 1 MB reader buffer
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL, limit=1 << 20
+    )
     try:
-        parts = timestr.split(':')
-        h = int(parts[0]); m = int(parts[1]); s = float(parts[2])
-        return h*3600 + m*60 + s
-    except Exception:
-        return 0.0
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            if line.startswith(b"out_time_us=") and total_duration:
+                try:
+                    secs = int(line[12:]) / 1_000_000
+                except ValueError:  # "N/A" before the first frame
+                    continue
+                jobs[job_id]["progress"] = round(min(100.0, secs / total_duration * 100.0), 2)
+                jobs[job_id]["updated_at"] = time.time()
+                if progress_due(job_id):
+                    await manager.broadcast({"type": msg_type, "job_id": job_id, "progress": jobs[job_id]["progress"]})
+                    await push_job_update(job_id, force=True)
+        await proc.wait()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed with code {proc.returncode}")
+        os.replace(tmp_path, outpath)
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
 
 # 3) CREATE CLIP (simple drawtext) with FFmpeg progress parsing
 async def do_clip(job_id: str):
@@ -346,48 +612,45 @@ async def do_clip(job_id: str):
 
     outpath = os.path.join(CLIPS_DIR, output_name)
 
+    info = await asyncio.to_thread(probe_video, input_path)
+    # Always apply vertical 9:16 crop + scale (in the decoder when NVDEC can)
+    input_args, vf_main = vertical_filter_args(info)
+
     vf = None
     if text:
         safe_text = text.replace("'", "\\'")
         vf = (f"drawtext=text='{safe_text}':"f"fontfile={DEFAULT_EMOJI_FONT}:"f"fontcolor=white:fontsize=28:"f"x=(w-text_w)/2:y=h-200:"f"box=1:boxcolor=black@0.6:boxborderw=10")
 
-        # Always apply vertical 9:16 crop + scale
-        vf_main = vertical_filter()
         # If user entered text, overlay AFTER resizing
-        if vf:
-            final_vf = f"{vf_main},hflip,{vf}"
-        else:
-            final_vf = vf_main
+        final_vf = ",".join(f for f in (vf_main, "hflip", vf) if f)
 
         cmd = [
-            "ffmpeg", "-y",
+            "ffmpeg", "-y", *input_args,
             "-ss", str(start), "-i", input_path,
             "-t", str(duration),
-            "-vf", final_vf,
-            "-c:v", "libx264",
-            "-c:a", "aac",
+            *encode_args(HW_ENCODER, final_vf),
             outpath
         ]
-    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, universal_newlines=True)
+    else:
+        if needs_vertical_reframe(info):
+            cmd = [
+                "ffmpeg", "-y", *input_args,
+                "-ss", str(start), "-i", input_path,
+                "-t", str(duration),
+                *encode_args(HW_ENCODER, vf_main),
+                outpath
+            ]
+        else:
+            # already vertical and nothing to draw: cut on keyframes without re-encoding
+            cmd = [
+                "ffmpeg", "-y",
+                "-ss", str(start), "-i", input_path,
+                "-t", str(duration),
+                "-c", "copy", "-avoid_negative_ts", "make_zero",
+                outpath
+            ]
     try:
-        while True:
-            line = proc.stderr.readline()
-            if not line:
-                break
-            if "time=" in line:
-                # parse time=HH:MM:SS.xx
-                import re
-                m = re.search(r"time=(\d+:\d+:\d+\.\d+)", line)
-                if m:
-                    secs = ffmpeg_time_to_secs(m.group(1))
-                    prog = (secs / duration) * 100.0
-                    jobs[job_id]["progress"] = round(min(100.0, prog), 2)
-                    jobs[job_id]["updated_at"] = time.time()
-                    await manager.broadcast({"type": "clip_progress", "job_id": job_id, "progress": jobs[job_id]["progress"]})
-                    await push_job_update(job_id)
-        proc.wait()
-        if proc.returncode != 0:
-            raise RuntimeError(f"ffmpeg failed with code {proc.returncode}")
+        await run_ffmpeg_progress(cmd, duration, job_id, "clip_progress")
         jobs[job_id]["status"] = "finished"
         jobs[job_id]["result"] = {"clip_file": outpath}
         jobs[job_id]["progress"] = 100.0
@@ -395,10 +658,9 @@ async def do_clip(job_id: str):
         # copy into session if requested
         if session_id:
             os.makedirs(os.path.join(SESSIONS_DIR, session_id), exist_ok=True)
-            shutil.copy(outpath, os.path.join(SESSIONS_DIR, session_id, os.path.basename(outpath)))
+            _link_or_copy(outpath, os.path.join(SESSIONS_DIR, session_id, os.path.basename(outpath)))
         await push_job_update(job_id)
     except Exception as e:
-        proc.kill()
         jobs[job_id]["status"] = "error"
         jobs[job_id]["error"] = str(e)
         jobs[job_id]["updated_at"] = time.time()
@@ -433,11 +695,15 @@ async def do_template_clip(job_id: str):
     outpath = os.path.join(CLIPS_DIR, output_name if output_name.endswith(".mp4") else output_name + ".mp4")
 
     vf_filters = []
+    # (png, x, y) for texts pre-rendered with Pillow; blitted with overlay instead of drawtext
+    overlays = []
+    res_scale = None
     # resolution
     if template.get("resolution"):
         try:
             w, h = template["resolution"].split("x")
-            vf_filters.append(f"scale={w}:{h}")
+            res_scale = f"scale={w}:{h}"
+            vf_filters.append(res_scale)
         except Exception:
             pass
 
@@ -486,6 +752,25 @@ async def do_template_clip(job_id: str):
             auto_y = PORTRAIT_H - SAFE_BOTTOM - bottom_stack - estimated_h
             bottom_stack += estimated_h + 40
 
+        fontfile = txt.get("fontfile") if txt.get("fontfile") and os.path.exists(txt.get("fontfile")) else DEFAULT_EMOJI_FONT
+
+        # Static text at a known x: shape glyphs once into a PNG rather than every frame.
+        # Expansions (%{...}), custom x expressions and fonts Pillow can't scale stay on drawtext.
+        raw_text = txt.get("text", "")
+        if "%{" not in raw_text and (txt.get("x", "center") == "center" or str(txt.get("x")).isdigit()):
+            try:
+                png, off_x, off_y = await asyncio.to_thread(
+                    render_text_png, raw_text, fontfile, fontsize, fontcolor,
+                    bool(txt.get("box")), txt.get("boxcolor", "black@0.5"), txt.get("boxborder", 5),
+                    txt.get("strokecolor"), txt.get("strokewidth", 1),
+                    txt.get("shadowcolor"), txt.get("shadowx", 0), txt.get("shadowy", 0)
+                )
+                ox = "(W-w)/2" if txt.get("x", "center") == "center" else int(txt["x"]) - off_x
+                overlays.append((png, ox, auto_y - off_y))
+                continue
+            except Exception:
+                pass
+
         draw = (
             f"drawtext=text='{text}':"
             f"fontcolor={fontcolor}:fontsize={fontsize}:"
@@ -509,45 +794,36 @@ async def do_template_clip(job_id: str):
             shadowy = txt.get("shadowy", 0)
             draw += f":shadowcolor={txt.get('shadowcolor')}:shadowx={shadowx}:shadowy={shadowy}"
 
-        if txt.get("fontfile") and os.path.exists(txt.get("fontfile")):
-            draw += f":fontfile={txt.get('fontfile')}"
-        else:
-            draw += f":fontfile={DEFAULT_EMOJI_FONT}"
+        draw += f":fontfile={fontfile}"
 
         vf_filters.append(draw)
 
     vf_arg = ",".join(vf_filters) if vf_filters else None
-    vf_main = vertical_filter()
-    final_vf = f"{vf_main},hflip,{vf_arg}" if vf_arg else vf_main
+    info = await asyncio.to_thread(probe_video, input_path)
+    input_args, vf_main = vertical_filter_args(info)
+    # mirrored only when the template adds filters of its own, as before
+    final_vf = ",".join(f for f in (vf_main, "hflip", vf_arg) if f) if vf_arg else vf_main
+    png_inputs = []
+    if overlays:
+        # [0:v] reframed -> overlay each PNG input in turn -> remaining drawtext filters
+        base = ",".join(f for f in (vf_main, "hflip", res_scale) if f)
+        draws = ",".join(f for f in vf_filters if f != res_scale)
+        final_vf = f"[0:v]{base}[v0]"
+        for i, (png, ox, oy) in enumerate(overlays, start=1):
+            final_vf += f";[v{i - 1}][{i}:v]overlay=x={ox}:y={oy}[v{i}]"
+            png_inputs += ["-i", png]
+        final_vf += f";[v{len(overlays)}]{draws or 'null'}"
+    # crop/scale/drawtext run as one filter_complex graph so libavfilter slice-threads it
     cmd = [
-        "ffmpeg", "-y",
-        "-ss", str(start), "-i", input_path,
+        "ffmpeg", "-y", "-filter_complex_threads", FILTER_THREADS, *input_args,
+        "-ss", str(start), "-i", input_path, *png_inputs,
         "-t", str(duration),
-        "-vf", final_vf,
-        "-c:v", "libx264",
-        "-c:a", "aac",
+        *encode_args(HW_ENCODER, final_vf, complex_graph=True),
         outpath
     ]
 
-    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, universal_newlines=True)
     try:
-        while True:
-            line = proc.stderr.readline()
-            if not line:
-                break
-            if "time=" in line:
-                import re
-                m = re.search(r"time=(\d+:\d+:\d+\.\d+)", line)
-                if m:
-                    secs = ffmpeg_time_to_secs(m.group(1))
-                    prog = (secs / duration) * 100.0
-                    jobs[job_id]["progress"] = round(min(100.0, prog), 2)
-                    jobs[job_id]["updated_at"] = time.time()
-                    await manager.broadcast({"type": "template_progress", "job_id": job_id, "progress": jobs[job_id]["progress"]})
-                    await push_job_update(job_id)
-        proc.wait()
-        if proc.returncode != 0:
-            raise RuntimeError(f"ffmpeg failed with code {proc.returncode}")
+        await run_ffmpeg_progress(cmd, duration, job_id, "template_progress")
 
         jobs[job_id]["status"] = "finished"
         jobs[job_id]["result"] = {"clip_file": outpath}
@@ -555,10 +831,9 @@ async def do_template_clip(job_id: str):
         jobs[job_id]["updated_at"] = time.time()
         if session_id:
             os.makedirs(os.path.join(SESSIONS_DIR, session_id), exist_ok=True)
-            shutil.copy(outpath, os.path.join(SESSIONS_DIR, session_id, os.path.basename(outpath)))
+            _link_or_copy(outpath, os.path.join(SESSIONS_DIR, session_id, os.path.basename(outpath)))
         await push_job_update(job_id)
     except Exception as e:
-        proc.kill()
         jobs[job_id]["status"] = "error"
         jobs[job_id]["error"] = str(e)
         jobs[job_id]["updated_at"] = time.time()
@@ -581,51 +856,36 @@ async def do_merge(job_id: str):
 
     outpath = os.path.join(CLIPS_DIR, output_name if output_name.endswith(".mp4") else output_name + ".mp4")
 
-    # We'll run ffmpeg concat re-encode so we can get progress (time)
-        # Apply vertical 9:16 crop on merged output
-    vf_main = vertical_filter()
+    # probe every clip: durations give the progress total, stream params decide copy vs re-encode
+    # probes run side by side; ffprobe startup dominates each one
+    infos = await asyncio.gather(*(asyncio.to_thread(probe_video, os.path.join(CLIPS_DIR, c)) for c in clips))
+    total_duration = sum(info.get("duration", 0.0) for info in infos)
 
-    cmd = [
-        "ffmpeg", "-y",
-        "-f", "concat",
-        "-safe", "0",
-        "-i", list_file,
-        "-vf", vf_main,
-        "-c:v", "libx264",
-        "-c:a", "aac",
-        outpath
-    ]
-
-
-    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, universal_newlines=True)
-    # estimate total duration by summing clip durations
-    total_duration = 0.0
-    for c in clips:
-        clip_path = os.path.join(CLIPS_DIR, c)
-        try:
-            out = subprocess.run(["ffprobe","-v","error","-show_entries","format=duration","-of","default=noprint_wrappers=1:nokey=1", clip_path], capture_output=True, text=True, check=True)
-            total_duration += float(out.stdout.strip()) if out.stdout else 0.0
-        except Exception:
-            total_duration += 0.0
+    keys = ("codec_name", "profile", "width", "height", "pix_fmt")
+    same_params = all(infos) and len({tuple(info.get(k) for k in keys) for info in infos}) == 1
+    if same_params and not needs_vertical_reframe(infos[0]):
+        # clips already share codec params at 1080x1920: concat demuxer stream copy
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", list_file,
+            "-c", "copy",
+            outpath
+        ]
+    else:
+        # Apply vertical 9:16 crop on merged output
+        cmd = [
+            "ffmpeg", "-y", *hw_input_args(HW_ENCODER),
+            "-f", "concat",
+            "-safe", "0",
+            "-i", list_file,
+            *encode_args(HW_ENCODER, vertical_filter()),
+            outpath
+        ]
 
     try:
-        while True:
-            line = proc.stderr.readline()
-            if not line:
-                break
-            if "time=" in line:
-                import re
-                m = re.search(r"time=(\d+:\d+:\d+\.\d+)", line)
-                if m:
-                    secs = ffmpeg_time_to_secs(m.group(1))
-                    prog = (secs / total_duration) * 100.0 if total_duration else 0.0
-                    jobs[job_id]["progress"] = round(min(100.0, prog), 2)
-                    jobs[job_id]["updated_at"] = time.time()
-                    await manager.broadcast({"type": "merge_progress", "job_id": job_id, "progress": jobs[job_id]["progress"]})
-                    await push_job_update(job_id)
-        proc.wait()
-        if proc.returncode != 0:
-            raise RuntimeError(f"ffmpeg failed with code {proc.returncode}")
+        await run_ffmpeg_progress(cmd, total_duration, job_id, "merge_progress")
 
         jobs[job_id]["status"] = "finished"
         jobs[job_id]["result"] = {"merged_file": outpath}
@@ -633,10 +893,9 @@ async def do_merge(job_id: str):
         jobs[job_id]["updated_at"] = time.time()
         if session_id:
             os.makedirs(os.path.join(SESSIONS_DIR, session_id), exist_ok=True)
-            shutil.copy(outpath, os.path.join(SESSIONS_DIR, session_id, os.path.basename(outpath)))
+            _link_or_copy(outpath, os.path.join(SESSIONS_DIR, session_id, os.path.basename(outpath)))
         await push_job_update(job_id)
     except Exception as e:
-        proc.kill()
         jobs[job_id]["status"] = "error"
         jobs[job_id]["error"] = str(e)
         jobs[job_id]["updated_at"] = time.time()
@@ -673,15 +932,33 @@ def cleanup_session_immediate(session_id: str, delete_clips: bool = True, delete
 # -----------------------
 # Worker dispatcher
 # -----------------------
-async def worker_loop():
-    while True:
-        job_id = await job_queue.get()
-        job = jobs.get(job_id)
+# caps per job kind so several workers never oversubscribe the CPU/GPU with encodes
+CLIP_CONCURRENCY = max(1, (os.cpu_count() or 4) // 4)
+SEMAPHORES: Dict[str, asyncio.Semaphore] = {
+    "download": asyncio.Semaphore(4),
+    "transcribe": asyncio.Semaphore(1),
+    "clip": asyncio.Semaphore(CLIP_CONCURRENCY),
+    "template_clip": asyncio.Semaphore(CLIP_CONCURRENCY),
+    "merge": asyncio.Semaphore(1),
+}
+WORKERS = int(os.getenv("WORKERS", "4"))
+WORKER_SLOTS = asyncio.Semaphore(WORKERS)
+_running_jobs: set = set()  # strong refs so running job tasks aren't garbage collected
+
+async def run_job(job_id: str):
+    job = jobs.get(job_id)
+    try:
         if not job:
-            job_queue.task_done()
-            continue
+            return
         kind = job["kind"]
-        try:
+        if kind not in SEMAPHORES:
+            jobs[job_id]["status"] = "error"
+            jobs[job_id]["error"] = f"unknown job kind: {kind}"
+            await push_job_update(job_id)
+            return
+        # wait on the kind's budget first: queued merges/transcribes never hold a
+        # worker slot that downloads and clips could use
+        async with SEMAPHORES[kind], WORKER_SLOTS:
             if kind == "download":
                 await do_download(job_id)
             elif kind == "transcribe":
@@ -692,25 +969,31 @@ async def worker_loop():
                 await do_template_clip(job_id)
             elif kind == "merge":
                 await do_merge(job_id)
-            else:
-                jobs[job_id]["status"] = "error"
-                jobs[job_id]["error"] = f"unknown job kind: {kind}"
-                await push_job_update(job_id)
-        except Exception as e:
-            jobs[job_id]["status"] = "error"
-            jobs[job_id]["error"] = str(e)
-            await push_job_update(job_id)
-        finally:
-            job_queue.task_done()
+    except Exception as e:
+        jobs[job_id]["status"] = "error"
+        jobs[job_id]["error"] = str(e)
+        await push_job_update(job_id)
+    finally:
+        job_queue.task_done()
+
+async def dispatch_loop():
+    """Start a task per queued job; SEMAPHORES and WORKER_SLOTS decide when it runs"""
+    while True:
+        job_id = await job_queue.get()
+        task = asyncio.create_task(run_job(job_id))
+        _running_jobs.add(task)
+        task.add_done_callback(_running_jobs.discard)
 
 # -----------------------
 # Startup: spawn workers
 # -----------------------
 @app.on_event("startup")
 async def startup_event():
-    # spawn 1 worker by default; increase for concurrency
-    for _ in range(1):
-        asyncio.create_task(worker_loop())
+    # WORKERS jobs run concurrently; SEMAPHORES keep each kind within its budget
+    asyncio.create_task(dispatch_loop())
+    asyncio.create_task(sweep_jobs())
+    # load (and download, first run) the Whisper model before the first transcribe job
+    asyncio.create_task(whisper_backend.load())
 
 # -----------------------
 # API endpoints
@@ -740,6 +1023,12 @@ async def api_clip(req: ClipRequest):
     await push_job_update(job_id)
     return {"job_id": job_id}
 
+@functools.lru_cache(maxsize=128)
+def _load_template(path: str, mtime: float) -> dict:
+    # mtime is part of the cache key, so an edited template is re-read
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 @app.post("/api/template-clip")
 async def api_template_clip(req: TemplateClipRequest):
     # load template from file or use provided json
@@ -748,9 +1037,7 @@ async def api_template_clip(req: TemplateClipRequest):
         path = os.path.join(TEMPLATES_DIR, req.template_name)
         if not os.path.exists(path):
             return JSONResponse({"error": "template not found"}, status_code=404)
-        import json
-        with open(path, "r", encoding="utf-8") as f:
-            template = json.load(f)
+        template = _load_template(path, os.path.getmtime(path))
     elif req.template_json:
         template = req.template_json
     else:
@@ -1,9 +1,22 @@
 # utils/video_tools.py
 import os
+import asyncio
 import subprocess
 import json
-import time
-from typing import List, Dict
+import re
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import struct
+import tempfile
+import uuid
+from functools import lru_cache
+from typing import IO, Callable, List, Dict, Optional, Tuple
+
+try:
+    from PIL import Image, ImageColor, ImageDraw, ImageFont
+except ImportError:  # optional: templates fall back to drawtext
+    Image = None
 
 DOWNLOADS_DIR = "downloads"
 CLIPS_DIR = "clips"
@@ -15,43 +28,652 @@ os.makedirs(SESSIONS_DIR, exist_ok=True)
 os.makedirs(CLIPS_DIR, exist_ok=True)
 
 
+# filename sanitizers; \w keeps the same (Unicode) letters and digits str.isalnum() did
+_SANITIZE = re.compile(r"[^\w.-]")
+_SANITIZE_LIST = re.compile(r"[^\w-]")
+
+
+def _safe_name(s: str) -> str:
+    return _SANITIZE.sub("_", s)
+
+
+# session ids whose folder already exists; cleanup_session forgets them again
+_created_sessions = set()
+
+
 def _make_session_folder(session_id: str) -> str:
     folder = os.path.join(SESSIONS_DIR, session_id)
+    if session_id in _created_sessions:
+        return folder
     os.makedirs(folder, exist_ok=True)
+    _created_sessions.add(session_id)
     return folder
 
 
+def _same_device(a: str, b: str) -> bool:
+    """True if paths a and b live on the same filesystem (so a hardlink between them works)"""
+    try:
+        return os.stat(a).st_dev == os.stat(b).st_dev
+    except OSError:
+        return False
+
+
+def _mirror_to_session(src: str, dst: str):
+    """Mirror src at dst: hardlink (no bytes moved), else copy_file_range, else copyfile"""
+    if os.path.lexists(dst):
+        # never write through an old hardlink to the same inode
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    _copy_into_place(src, dst)
+
+
+def _part_path(path: str) -> str:
+    """Unique temp name next to path (same extension) for ffmpeg to write before os.replace"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{uuid.uuid4().hex}.part{ext}"
+
+
+def _copy_into_place(src: str, dst: str):
+    """
+    Independent copy of src at dst (copy_file_range, else copyfile), written to a temp
+    name and renamed over dst, so existing links to the old dst keep their contents.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst) or ".", suffix=".part")
+    try:
+        with open(src, "rb") as fsrc, os.fdopen(fd, "wb") as fdst:
+            copied_all = False
+            if hasattr(os, "copy_file_range"):
+                try:
+                    remaining = os.fstat(fsrc.fileno()).st_size
+                    while remaining > 0:
+                        copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                    copied_all = remaining == 0
+                except OSError:
+                    pass
+            if not copied_all:
+                import shutil
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+                shutil.copyfileobj(fsrc, fdst, 1 << 20)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
 # ---------------------------
-# 1. Render Clip With Template
+# 0. Hardware encoders
 # ---------------------------
-def render_template_clip(
-    input_file: str,
-    start: float,
-    end: float,
-    template: Dict,
-    output_name: str,
-    session_id: str = None
-) -> str:
+VAAPI_DEVICE = os.getenv("VAAPI_DEVICE", "/dev/dri/renderD128")
+
+# encoder -> device args, decode args, filter appended to -vf, codec args
+HW_ENCODER_PROFILES = {
+    "h264_nvenc": {
+        "device": [],
+        # decoded frames are copied back to system memory so crop/hflip/drawtext stay on the CPU
+        "decode": ["-hwaccel", "cuda"],
+        "filter": None,
+        "codec": ["-c:v", "h264_nvenc", "-preset", "p4", "-tune", "hq", "-rc", "vbr", "-cq", "23"],
+    },
+    "h264_qsv": {
+        "device": [],
+        "decode": [],
+        "filter": "format=nv12",
+        "codec": ["-c:v", "h264_qsv", "-preset", "medium", "-global_quality", "23"],
+    },
+    "h264_vaapi": {
+        "device": ["-vaapi_device", VAAPI_DEVICE],
+        "decode": [],
+        "filter": "format=nv12,hwupload",
+        "codec": ["-c:v", "h264_vaapi", "-qp", "23"],
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def detect_hw_encoder() -> Optional[str]:
+    """Return the first hardware H.264 encoder ffmpeg can actually open, else None (libx264); probed once"""
+    try:
+        encoders = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            capture_output=True, text=True, timeout=10
+        ).stdout
+    except Exception:
+        return None
+    for name, profile in HW_ENCODER_PROFILES.items():
+        if name not in encoders:
+            continue
+        # Listed encoders only reflect the build; make sure a device session opens
+        cmd = ["ffmpeg", "-hide_banner", "-v", "error"] + profile["device"]
+        cmd += ["-f", "lavfi", "-i", "nullsrc=s=256x256:d=0.1"]
+        if profile["filter"]:
+            cmd += ["-vf", profile["filter"]]
+        cmd += profile["codec"] + ["-f", "null", "-"]
+        try:
+            if subprocess.run(cmd, capture_output=True, timeout=20).returncode == 0:
+                return name
+        except Exception:
+            pass
+    return None
+
+
+# (path, mtime, size) -> probe result; many clips are cut from the same source
+_probe_cache: Dict[Tuple[str, float, int], Dict] = {}
+
+
+def _file_key(path: str) -> Optional[Tuple[str, float, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return os.path.abspath(path), st.st_mtime, st.st_size
+
+
+def probe_video(path: str) -> Dict:
+    """First video stream's codec_name/profile/width/height/pix_fmt plus duration, {} if ffprobe fails"""
+    key = _file_key(path)
+    if key in _probe_cache:
+        return dict(_probe_cache[key])
+    info = _probe_video(path)
+    if info and key:
+        _probe_cache[key] = dict(info)
+    return info
+
+
+def _probe_video(path: str) -> Dict:
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=codec_name,profile,width,height,pix_fmt:format=duration",
+             "-of", "json", path],
+            capture_output=True, text=True, check=True
+        ).stdout
+        data = json.loads(out)
+        info = data["streams"][0]
+    except Exception:
+        return {}
+    info["duration"] = float(data.get("format", {}).get("duration") or 0.0)
+    return info
+
+
+# Opt-in: copy each source once into MPEG-TS and cut stream-copy trims from that.
+# Costs one extra copy of the source on disk, so it only pays off for sources cut many times
+NORMALIZE_TS = os.getenv("VMAKER_NORMALIZE", "0") == "1"
+_ANNEXB_BSF = {"h264": "h264_mp4toannexb", "hevc": "hevc_mp4toannexb"}
+_normalized: Dict[Tuple[str, float, int], str] = {}
+
+
+def _ensure_normalized(input_path: str) -> str:
     """
-    Renders a clip using a JSON-based template that supports multiple text overlays.
+    Keyframe-aligned MPEG-TS copy of input_path (DOWNLOADS_DIR/<file name>.ts), made on the
+    first call and reused while the source is unchanged. Returns input_path itself
+    when the codec has no Annex B filter or the remux fails.
+    """
+    key = _file_key(input_path)
+    if key in _normalized:
+        return _normalized[key]
+    bsf = _ANNEXB_BSF.get(probe_video(input_path).get("codec_name"))
+    if not bsf or input_path.endswith(".ts"):
+        return input_path
+    # full source name: x.mp4 and x.mkv must not share x.ts
+    ts_path = input_path + ".ts"
+    if not (os.path.exists(ts_path) and os.path.getmtime(ts_path) >= key[1]):
+        # unique per call: concurrent async renders may normalize the same source at once
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(input_path) or ".", suffix=".ts.tmp")
+        os.close(fd)
+        try:
+            subprocess.run(
+                ["ffmpeg", "-y", "-v", "error", "-i", input_path, "-map", "0:v:0", "-map", "0:a?",
+                 "-c", "copy", "-bsf:v", bsf, "-f", "mpegts", tmp],
+                stdin=subprocess.DEVNULL, check=True
+            )
+            os.replace(tmp, ts_path)
+        except (OSError, subprocess.CalledProcessError):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return input_path
+    _normalized[key] = ts_path
+    return ts_path
 
-    Returns the output filename (relative to CLIPS_DIR).
+
+def _find_box(f, end: int, name: bytes) -> Optional[Tuple[int, int]]:
+    """(payload offset, payload size) of the first `name` box between f.tell() and end"""
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack(">I4s", header)
+        header_len = 8
+        if size == 1:  # 64-bit largesize follows
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_len = 16
+        elif size == 0:  # box runs to the end of the file
+            size = end - start
+        if size < header_len:
+            return None
+        if kind == name:
+            return start + header_len, size - header_len
+        f.seek(start + size)
+    return None
+
+
+@lru_cache(maxsize=256)
+def _mp4_duration(path: str, mtime: float) -> Optional[float]:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        file_end = f.tell()
+        f.seek(0)
+        # top-level boxes are skipped by size, so a moov after mdat costs only a few seeks
+        moov = _find_box(f, file_end, b"moov")
+        if not moov:
+            return None
+        f.seek(moov[0])
+        mvhd = _find_box(f, moov[0] + moov[1], b"mvhd")
+        if not mvhd:
+            return None
+        f.seek(mvhd[0])
+        version = f.read(4)[0]
+        if version == 1:
+            _created, _modified, timescale, duration = struct.unpack(">QQIQ", f.read(28))
+        else:
+            _created, _modified, timescale, duration = struct.unpack(">IIII", f.read(16))
+    return duration / timescale if timescale else None
+
+
+def mp4_duration(path: str) -> Optional[float]:
+    """Container duration from the MP4/MOV mvhd box; ffprobe only for other containers"""
+    try:
+        duration = _mp4_duration(path, os.path.getmtime(path))
+    except (OSError, struct.error, IndexError):
+        duration = None
+    if duration is None:
+        duration = probe_video(path).get("duration") or None
+    return duration
+
+
+def needs_vertical_reframe(info: Dict, size=(1080, 1920)) -> bool:
+    """True unless the probed video is already at the vertical output size"""
+    return (info.get("width"), info.get("height")) != size
+
+
+@lru_cache(maxsize=None)
+def cuvid_decoders() -> Dict[str, str]:
+    """codec_name -> NVDEC (cuvid) decoder for the ones this ffmpeg build has"""
+    try:
+        decoders = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-decoders"],
+            capture_output=True, text=True, timeout=10
+        ).stdout
+    except Exception:
+        return {}
+    return {codec: f"{codec}_cuvid" for codec in ("h264", "hevc") if f"{codec}_cuvid" in decoders}
+
+
+def hw_input_args(encoder: Optional[str]) -> List[str]:
+    """ffmpeg args that go before -i for the given encoder"""
+    if not encoder:
+        return []
+    profile = HW_ENCODER_PROFILES[encoder]
+    return profile["device"] + profile["decode"]
+
+
+def encode_args(encoder: Optional[str], vf: Optional[str] = None, complex_graph: bool = False) -> List[str]:
+    """
+    Filter plus video/audio codec args for the given encoder (None means libx264).
+    complex_graph passes the chain as a labelled -filter_complex graph instead of -vf,
+    so it can use the -filter_complex_threads pool. A chain that already starts with an
+    input label (e.g. overlays on extra inputs) is used as is; its last chain must be open.
     """
+    if encoder:
+        profile = HW_ENCODER_PROFILES[encoder]
+        filters = ",".join(f for f in (vf, profile["filter"]) if f)
+        codec = profile["codec"]
+    else:
+        filters = vf
+        codec = ["-c:v", "libx264"]
+    if not filters:
+        args = []
+    elif complex_graph:
+        graph = filters if filters.startswith("[") else f"[0:v]{filters}"
+        args = ["-filter_complex", f"{graph}[out]", "-map", "[out]", "-map", "0:a?"]
+    else:
+        args = ["-vf", filters]
+    return args + codec + ["-c:a", "aac"]
 
-    input_path = os.path.join(DOWNLOADS_DIR, input_file)
-    if not os.path.exists(input_path):
-        raise FileNotFoundError(f"Input file not found: {input_path}")
 
-    # If user provided a session_id, create a session folder copy of the clip (for cleanup)
-    session_folder = None
-    if session_id:
-        session_folder = _make_session_folder(session_id)
+# ---------------------------
+# 0b. Pre-rendered text overlays
+# ---------------------------
+TEXT_PNG_DIR = os.path.join(tempfile.gettempdir(), "vmaker_text")
+
+
+def _pil_color(value) -> Tuple[int, int, int, int]:
+    """ffmpeg color syntax (name, #RRGGBB or 0xRRGGBB, optional @alpha) -> RGBA"""
+    name, _, alpha = str(value).partition("@")
+    if name.lower().startswith("0x"):
+        name = "#" + name[2:]
+    r, g, b = ImageColor.getrgb(name)[:3]
+    return r, g, b, int(float(alpha) * 255) if alpha else 255
+
+
+def render_text_png(
+    text: str,
+    fontfile: str,
+    fontsize: int,
+    fontcolor: str = "white",
+    box: bool = False,
+    boxcolor: str = "black@0.5",
+    boxborder: int = 5,
+    strokecolor: Optional[str] = None,
+    strokewidth: int = 0,
+    shadowcolor: Optional[str] = None,
+    shadowx: int = 0,
+    shadowy: int = 0
+) -> Tuple[str, int, int]:
+    """
+    Render one drawtext-style text (box, stroke, shadow) once into a transparent PNG.
+    Returns (png path, x, y) where x/y is the text's top-left inside the image, so
+    an overlay at (text_x - x, text_y - y) lands where drawtext would have drawn it.
+    Raises if Pillow is missing or the font cannot be loaded at this size.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is not installed")
+    font = ImageFont.truetype(fontfile, int(fontsize))
+    sw = int(strokewidth) if strokecolor else 0
+    sx, sy = (int(shadowx), int(shadowy)) if shadowcolor else (0, 0)
+    bb = int(boxborder) if box else 0
+    left, top, right, bottom = font.getbbox(text, stroke_width=sw)
+
+    # canvas holds text + box border on every side + shadow offset on one side
+    off_x = bb + max(0, -sx)
+    off_y = bb + max(0, -sy)
+    width = (right - left) + 2 * bb + abs(sx)
+    height = (bottom - top) + 2 * bb + abs(sy)
+    origin = (off_x - left, off_y - top)
+
+    key = hashlib.sha1(json.dumps(
+        [text, os.path.abspath(fontfile), fontsize, fontcolor, box, boxcolor, boxborder,
+         strokecolor, strokewidth, shadowcolor, shadowx, shadowy], ensure_ascii=False
+    ).encode("utf-8")).hexdigest()
+    os.makedirs(TEXT_PNG_DIR, exist_ok=True)
+    path = os.path.join(TEXT_PNG_DIR, f"tpl_{key}.png")
+    if os.path.exists(path):
+        return path, off_x, off_y
+
+    img = Image.new("RGBA", (max(1, width), max(1, height)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    if box:
+        draw.rectangle(
+            [off_x - bb, off_y - bb, off_x + (right - left) + bb - 1, off_y + (bottom - top) + bb - 1],
+            fill=_pil_color(boxcolor)
+        )
+    if shadowcolor:
+        draw.text((origin[0] + sx, origin[1] + sy), text, font=font, fill=_pil_color(shadowcolor),
+                  stroke_width=sw, stroke_fill=_pil_color(shadowcolor))
+    draw.text(origin, text, font=font, fill=_pil_color(fontcolor),
+              stroke_width=sw, stroke_fill=_pil_color(strokecolor) if sw else None)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    img.save(tmp, format="PNG")
+    os.replace(tmp, path)
+    return path, off_x, off_y
+
+
+# ---------------------------
+# 0c. ASS subtitles for multi-text templates
+# ---------------------------
+# libass rasterizes each glyph once per style; every drawtext re-renders its text on every frame
+_ASS_COLORS = {
+    "white": "ffffff", "black": "000000", "red": "ff0000", "green": "008000", "blue": "0000ff",
+    "yellow": "ffff00", "cyan": "00ffff", "magenta": "ff00ff", "orange": "ffa500",
+    "gray": "808080", "grey": "808080", "pink": "ffc0cb", "purple": "800080",
+}
+
+_ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {w}
+PlayResY: {h}
+WrapStyle: 2
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+"""
+
+
+def _ass_color(value) -> Optional[str]:
+    """ffmpeg color syntax (name, #RRGGBB or 0xRRGGBB, optional @alpha) -> ASS &HAABBGGRR, None if unknown"""
+    name, _, alpha = str(value).lower().partition("@")
+    if name.startswith("0x"):
+        rgb = name[2:]
+    elif name.startswith("#"):
+        rgb = name[1:]
+    else:
+        rgb = _ASS_COLORS.get(name, "")
+    if len(rgb) != 6 or any(c not in "0123456789abcdef" for c in rgb):
+        return None
+    try:
+        a = 255 - int(float(alpha) * 255) if alpha else 0
+    except ValueError:
+        return None
+    return f"&H{a:02X}{rgb[4:6]}{rgb[2:4]}{rgb[0:2]}".upper()
+
+
+def _sfnt_tables(f: IO[bytes]) -> Dict[bytes, int]:
+    """Table tag -> file offset from a TrueType/OpenType table directory"""
+    num_tables = struct.unpack(">H", f.read(12)[4:6])[0]
+    tables = f.read(16 * num_tables)
+    offsets = {}
+    for i in range(num_tables):
+        tag, _, offset, _ = struct.unpack_from(">4sIII", tables, 16 * i)
+        offsets[tag] = offset
+    return offsets
+
+
+@lru_cache(maxsize=32)
+def _font_family(fontfile: str) -> Optional[str]:
+    """Family name (name table, ID 1) of a TrueType/OpenType font; ASS styles select fonts by family"""
+    try:
+        with open(fontfile, "rb") as f:
+            offset = _sfnt_tables(f).get(b"name")
+            if offset is None:
+                return None
+            f.seek(offset)
+            _, count, strings = struct.unpack(">HHH", f.read(6))
+            records = f.read(12 * count)
+            for i in range(count):
+                platform, _, _, name_id, length, str_offset = struct.unpack_from(">6H", records, 12 * i)
+                if name_id == 1:
+                    f.seek(offset + strings + str_offset)
+                    raw = f.read(length)
+                    return raw.decode("utf-16-be" if platform in (0, 3) else "latin-1").strip() or None
+    except (OSError, struct.error, UnicodeDecodeError):
+        pass
+    return None
+
+
+# drawtext's fontsize is the em size in pixels; libass sizes a font so that its
+# OS/2 usWinAscent + usWinDescent (hhea ascender - descender without OS/2) spans
+# Fontsize. The ratio converts one to the other. The default is DejaVu Sans,
+# which fontconfig resolves "Sans" to on most systems.
+_DEFAULT_ASS_SIZE_RATIO = (1901 + 483) / 2048
+
+
+@lru_cache(maxsize=32)
+def _ass_size_ratio(fontfile: Optional[str]) -> float:
+    """ASS Fontsize per pixel of drawtext fontsize for fontfile"""
+    if not fontfile:
+        return _DEFAULT_ASS_SIZE_RATIO
+    try:
+        with open(fontfile, "rb") as f:
+            tables = _sfnt_tables(f)
+            f.seek(tables[b"head"] + 18)
+            units_per_em = struct.unpack(">H", f.read(2))[0]
+            if b"OS/2" in tables:
+                f.seek(tables[b"OS/2"] + 74)
+                ascent, descent = struct.unpack(">HH", f.read(4))
+                height = ascent + descent
+            else:
+                f.seek(tables[b"hhea"] + 4)
+                ascent, descent = struct.unpack(">hh", f.read(4))
+                height = ascent - descent
+    except (OSError, KeyError, struct.error):
+        return _DEFAULT_ASS_SIZE_RATIO
+    return height / units_per_em if units_per_em and height > 0 else _DEFAULT_ASS_SIZE_RATIO
+
+
+# A filter option value goes through the option parser, then the filtergraph parser
+_OPTION_ESCAPE = str.maketrans({"\\": "\\\\", "'": "\\'", ":": "\\:"})
+_GRAPH_ESCAPE = str.maketrans({c: "\\" + c for c in "\\'[],;"})
+
+
+def _filter_value(value: str) -> str:
+    """Escape value (e.g. a path) for use as one filter option inside a -vf chain"""
+    return value.translate(_OPTION_ESCAPE).translate(_GRAPH_ESCAPE)
+
+
+def _ass_pos(expr, extent: int) -> Optional[float]:
+    """Plain drawtext position (N, w-N / h-N) -> pixels, None for anything else"""
+    expr = str(expr).replace(" ", "").lower()
+    if expr[:2] in ("w-", "h-"):
+        expr, base = expr[2:], extent
+    else:
+        base = None
+    try:
+        value = float(expr)
+    except ValueError:
+        return None
+    return base - value if base is not None else value
+
+
+def _ass_overlay(texts: List[Dict], size: Tuple[int, int]) -> Optional[Tuple[str, str]]:
+    """
+    Write texts as one .ass file in CLIPS_DIR and return (subtitles filter, ass path).
+    Returns None (caller keeps drawtext) for anything the .ass cannot reproduce:
+    override braces in the text, colors/positions beyond the plain forms, fonts
+    that cannot be named or that live in different folders.
+    """
+    w, h = size
+    styles, events, font_dirs = [], [], set()
+    for i, txt in enumerate(texts):
+        text = str(txt.get("text", ""))
+        if "{" in text or "\\" in text:
+            return None
+        primary = _ass_color(txt.get("fontcolor", "white"))
+        box = _ass_color(txt.get("boxcolor", "black@0.5")) if txt.get("box") else "&H00000000"
+        if not primary or not box:
+            return None
+
+        x_expr = str(txt.get("x", "(w-text_w)/2")).replace(" ", "")
+        if x_expr in ("(w-text_w)/2", "center"):
+            x, align = w / 2, 8  # top-center
+        else:
+            x, align = _ass_pos(x_expr, w), 7  # top-left, as drawtext places x/y
+        y = _ass_pos(txt.get("y", "h-150"), h)
+        if x is None or y is None:
+            return None
+
+        family = "Sans"
+        try:
+            fontsize = float(txt.get("fontsize", 48)) * _ass_size_ratio(txt.get("fontfile"))
+        except ValueError:  # an expression only drawtext can evaluate
+            return None
+        if txt.get("fontfile"):
+            family = _font_family(txt["fontfile"])
+            if not family:
+                return None
+            font_dirs.add(os.path.dirname(os.path.abspath(txt["fontfile"])))
+
+        border_style, outline = (3, int(txt.get("boxborder", 5))) if txt.get("box") else (1, 0)
+        styles.append(
+            f"Style: t{i},{family},{fontsize:.2f},{primary},{primary},{box},{box},"
+            f"0,0,0,0,100,100,0,0,{border_style},{outline},0,{align},0,0,0,1"
+        )
+        events.append(f"Dialogue: 0,0:00:00.00,9:59:59.99,t{i},,0,0,0,,{{\\pos({x:g},{y:g})}}" + text.replace("\n", "\\N"))
+
+    if len(font_dirs) > 1:
+        return None
+
+    path = os.path.join(CLIPS_DIR, f"_sub_{uuid.uuid4().hex}.ass")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_ASS_HEADER.format(w=w, h=h))
+        f.write("\n".join(styles))
+        f.write("\n\n[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
+        f.write("\n".join(events) + "\n")
+
+    vf = f"subtitles=filename={_filter_value(path)}"
+    if font_dirs:
+        vf += f":fontsdir={_filter_value(font_dirs.pop())}"
+    return vf, path
+
+
+# ---------------------------
+# 1. Render Clip With Template
+# ---------------------------
+def _tee_escape(path: str) -> str:
+    """Escape a path for use as one tee muxer slave"""
+    for ch in "\\|[]:":
+        path = path.replace(ch, "\\" + ch)
+    return path
 
-    # sanitize output_name
-    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in output_name)
-    output_file = f"{safe_name}.mp4"
-    output_path = os.path.join(CLIPS_DIR, output_file)
 
+def _output_target(output_path: str, session_path: Optional[str] = None, movflags: Optional[str] = None) -> List[str]:
+    """Output args for output_path; with session_path the tee muxer writes both in the same pass"""
+    if not session_path:
+        return (["-movflags", movflags] if movflags else []) + [output_path]
+    opts = "f=mp4" + (f":movflags={movflags}" if movflags else "")
+    # tee only takes explicitly mapped streams; callers always pass -map
+    return ["-f", "tee", f"[{opts}]{_tee_escape(output_path)}|[{opts}]{_tee_escape(session_path)}"]
+
+
+# Opt-in: split single filtered renders into decoder | encoder processes so demux/decode
+# and filter/encode run on different cores
+PIPELINE_TRANSCODE = os.getenv("VMAKER_PIPELINE", "0") == "1"
+
+# filter threads per render when the caller doesn't cap threads; half the cores leaves room for the encoder
+FILTER_THREADS = max(1, (os.cpu_count() or 2) // 2)
+
+
+def _run_piped(decode_cmd: List[str], encode_cmd: List[str]):
+    """Run decode_cmd | encode_cmd with a large pipe buffer; raise if either side fails"""
+    decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, bufsize=8 << 20)
+    try:
+        encoder = subprocess.Popen(encode_cmd, stdin=decoder.stdout)
+    except BaseException:
+        # nobody will read the pipe: a full pipe would block the decoder (and our wait) forever
+        decoder.stdout.close()
+        decoder.kill()
+        decoder.wait()
+        raise
+    try:
+        decoder.stdout.close()  # the encoder owns the read end now
+        encode_rc = encoder.wait()
+    finally:
+        decode_rc = decoder.wait()
+    if encode_rc or decode_rc:
+        raise subprocess.CalledProcessError(encode_rc or decode_rc, encode_cmd if encode_rc else decode_cmd)
+
+
+def _template_filter(template: Dict, size: Optional[Tuple[int, int]] = None) -> Tuple[Optional[str], List[str]]:
+    """
+    -vf chain for a template: optional resolution scale plus the texts.
+    Two or more texts are burned in from one .ass file when possible, otherwise one
+    drawtext per text. Returns (vf, temp files to delete after the run).
+    """
     vf_filters = []
 
     # Resolution override (expects "WIDTHxHEIGHT", e.g. "1080x1920")
@@ -59,11 +681,18 @@ def render_template_clip(
         try:
             w, h = template["resolution"].split("x")
             vf_filters.append(f"scale={w}:{h}")
+            size = (int(w), int(h))
         except Exception:
             pass
 
+    texts = template.get("texts", [])
+    ass = _ass_overlay(texts, size) if len(texts) >= 2 and size else None
+    if ass:
+        vf_filters.append(ass[0])
+        return ",".join(vf_filters), [ass[1]]
+
     # Add multiple text overlays (drawtext)
-    for txt in template.get("texts", []):
+    for txt in texts:
         text = txt.get("text", "")
         # if the text contains the placeholder {USER_TEXT} the UI will replace it beforehand
         escaped_text = text.replace("'", r"\'")
@@ -81,25 +710,331 @@ def render_template_clip(
             draw += f":box=1:boxcolor={txt.get('boxcolor','black@0.5')}:boxborderw={txt.get('boxborder', 5)}"
         vf_filters.append(draw)
 
-    vf_arg = ",".join(vf_filters) if vf_filters else None
+    return (",".join(vf_filters) if vf_filters else None), []
+
+
+def _plan_template_batch(
+    input_file: str,
+    jobs: List[Dict],
+    session_id: str = None,
+    threads: Optional[int] = None,
+    streamed: bool = False
+) -> Tuple[List[List[str]], Optional[Tuple[List[str], List[str]]], List[str], Callable[[], List[str]]]:
+    """
+    Probe the input and build the ffmpeg run for render_template_clips_batch(_async).
+    streamed reads the input from ffmpeg's stdin instead of DOWNLOADS_DIR/input_file.
+    Returns (commands to try in order, decoder|encoder pair when piping instead,
+    temp files to delete after the run, finish() which renames the outputs into
+    place, mirrors them to the session and returns the output filenames).
+    """
+    if streamed:
+        input_path = "pipe:0"
+    else:
+        input_path = os.path.join(DOWNLOADS_DIR, input_file)
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    # If user provided a session_id, create a session folder copy of the clip (for cleanup)
+    session_folder = None
+    if session_id:
+        session_folder = _make_session_folder(session_id)
+
+    # cached per source file, so a run of clips from one upload probes it once.
+    # A stream can only be read once, by ffmpeg itself
+    info = {} if streamed else probe_video(input_path)
+    duration = info.get("duration")
+    size = (info["width"], info["height"]) if info.get("width") and info.get("height") else None
+
+    outputs, temp_files = [], []
+    for job in jobs:
+        start, end = float(job["start"]), float(job["end"])
+        if duration:
+            if start >= duration:
+                raise ValueError(f"start {start} is past the end of {input_file} ({duration:.2f}s)")
+            end = min(end, duration)
+        # sanitize output_name
+        safe_name = _safe_name(job["output_name"])
+        vf_arg, job_temp = _template_filter(job["template"], size)
+        temp_files += job_temp
+        outputs.append((start, end, vf_arg, f"{safe_name}.mp4"))
+
+    thread_args = ["-threads", str(threads)] if threads else []
+    filter_thread_args = ["-filter_threads", str(threads or FILTER_THREADS),
+                          "-filter_complex_threads", str(threads or FILTER_THREADS)]
+    maps = ["-map", "0:v:0", "-map", "0:a?"]
+
+    # same filesystem: hardlink afterwards; otherwise tee writes the session copy in the same pass
+    link_session = bool(session_folder) and _same_device(CLIPS_DIR, session_folder)
+
+    # ffmpeg -y would truncate the existing file in place, and with it every session
+    # hardlink of an earlier render under that name: write temp names, rename on success
+    renames = []  # (part path, final path)
+    for _, _, _, output_file in outputs:
+        renames.append((_part_path(os.path.join(CLIPS_DIR, output_file)), os.path.join(CLIPS_DIR, output_file)))
+        if session_folder and not link_session:
+            session_path = os.path.join(session_folder, output_file)
+            renames.append((_part_path(session_path), session_path))
+    part_of = {final: part for part, final in renames}
+    temp_files += [part for part, _ in renames]
+
+    def target(output_file: str) -> List[str]:
+        session_path = os.path.join(session_folder, output_file) if session_folder and not link_session else None
+        # moov up front so downloads/previews start playing before the whole file arrives
+        return _output_target(part_of[os.path.join(CLIPS_DIR, output_file)],
+                              part_of[session_path] if session_path else None, "+faststart")
+
+    def build_cmd(encoder: Optional[str]) -> List[str]:
+        if len(outputs) == 1:
+            start, end, vf_arg, output_file = outputs[0]
+            if not vf_arg:
+                # nothing to scale or draw: a plain trim, cut on keyframes without re-encoding.
+                # With -ss before -i a copy already starts at the keyframe at/before start.
+                source = _ensure_normalized(input_path) if NORMALIZE_TS and not streamed else input_path
+                return ["ffmpeg", "-y", "-ss", str(start), "-i", source, "-t", str(end - start),
+                        *maps, "-c", "copy", "-avoid_negative_ts", "make_zero", *target(output_file)]
+            cmd = ["ffmpeg", "-y", *filter_thread_args] + hw_input_args(encoder)
+            cmd += ["-ss", str(start), "-i", input_path, "-t", str(end - start)]
+            # a real chain (scale + texts) goes in as one labelled graph; a lone filter stays on -vf
+            complex_graph = "," in vf_arg
+            return cmd + ([] if complex_graph else maps) + encode_args(encoder, vf_arg, complex_graph) \
+                + thread_args + target(output_file)
+
+        if streamed:
+            # stdin is read once: seek the shared input to the earliest clip and let
+            # each output skip to its own offset
+            base = min(start for start, _, _, _ in outputs)
+            cmd = ["ffmpeg", "-y", *filter_thread_args] + hw_input_args(encoder) + ["-ss", str(base), "-i", input_path]
+            for start, end, vf_arg, output_file in outputs:
+                cmd += maps + ["-ss", str(start - base), "-t", str(end - start)]
+                cmd += encode_args(encoder, vf_arg) + thread_args + target(output_file)
+            return cmd
+
+        # One input per clip, each seeked to its own start, so nothing between clips is
+        # decoded; the process, codec setup and hw device are still shared
+        profile = HW_ENCODER_PROFILES[encoder] if encoder else {"device": [], "decode": []}
+        cmd = ["ffmpeg", "-y", *filter_thread_args, *profile["device"]]
+        for start, end, _, _ in outputs:
+            cmd += profile["decode"] + ["-ss", str(start), "-t", str(end - start), "-i", input_path]
+        for i, (_, _, vf_arg, output_file) in enumerate(outputs):
+            cmd += ["-map", f"{i}:v:0", "-map", f"{i}:a?"]
+            cmd += encode_args(encoder, vf_arg) + thread_args + target(output_file)
+        return cmd
 
-    cmd = ["ffmpeg", "-y", "-ss", str(start), "-i", input_path, "-t", str(end - start)]
-    if vf_arg:
-        cmd += ["-vf", vf_arg]
-    cmd += ["-c:v", "libx264", "-c:a", "aac", output_path]
+    def build_piped_cmds():
+        start, end, vf_arg, output_file = outputs[0]
+        # raw frames + PCM over NUT: nothing to re-parse on the encoder side
+        decode_cmd = ["ffmpeg", "-v", "error", "-ss", str(start), "-i", input_path, "-t", str(end - start),
+                      *maps, "-c:v", "rawvideo", "-c:a", "pcm_s16le", "-f", "nut", "-"]
+        encode_cmd = ["ffmpeg", "-y", "-f", "nut", "-i", "-", *maps]
+        encode_cmd += encode_args(None, vf_arg) + thread_args + target(output_file)
+        return decode_cmd, encode_cmd
 
-    subprocess.run(cmd, check=True)
+    needs_encode = len(outputs) > 1 or outputs[0][2]
+    encoder = detect_hw_encoder() if needs_encode else None
+    piped = None
+    if PIPELINE_TRANSCODE and not streamed and not encoder and len(outputs) == 1 and outputs[0][2]:
+        piped = build_piped_cmds()
+    # GPU out of sessions/memory or an unsupported filter: redo it on libx264
+    cmds = [build_cmd(encoder)] + ([build_cmd(None)] if encoder else [])
 
-    # If session folder exists, copy the clip into session folder for tracking
-    if session_folder:
+    def finish() -> List[str]:
+        for part, final in renames:
+            os.replace(part, final)
+        if link_session:
+            for _, _, _, output_file in outputs:
+                _mirror_to_session(os.path.join(CLIPS_DIR, output_file), os.path.join(session_folder, output_file))
+        return [output_file for _, _, _, output_file in outputs]
+
+    return cmds, piped, temp_files, finish
+
+
+def _remove_files(paths: List[str]):
+    for path in paths:
         try:
-            subprocess.run(["cp" if os.name != "nt" else "copy", output_path, os.path.join(session_folder, output_file)], shell=(os.name == "nt"))
-        except Exception:
-            # fallback to python copy
-            import shutil
-            shutil.copy(output_path, os.path.join(session_folder, output_file))
+            os.remove(path)
+        except OSError:
+            pass
 
-    return output_file
+
+def render_template_clips_batch(
+    input_file: str,
+    jobs: List[Dict],
+    session_id: str = None,
+    threads: Optional[int] = None,
+    input_stream: Optional[IO[bytes]] = None
+) -> List[str]:
+    """
+    Renders several template clips from one input in a single ffmpeg run.
+    Each job is a dict with start, end, template and output_name. Every clip gets
+    its own input-seeked copy of the source, so only its own range is decoded.
+    threads caps ffmpeg's encoder/filter threads per output (default: ffmpeg's auto).
+    input_stream (a file object with a fileno, e.g. an upload or HTTP body) is fed
+    to ffmpeg as pipe:0 instead of reading DOWNLOADS_DIR/input_file; input_file then
+    only names the source in errors. Nothing is probed, so texts always use drawtext
+    and the end is not clamped to the source duration.
+
+    Returns the output filenames (relative to CLIPS_DIR), in job order.
+    """
+    streamed = input_stream is not None
+    cmds, piped, temp_files, finish = _plan_template_batch(input_file, jobs, session_id, threads, streamed)
+    if streamed:
+        # the libx264 retry has to read the input again: only possible if we can rewind it
+        seekable = getattr(input_stream, "seekable", lambda: False)()
+        rewind_to = input_stream.tell() if seekable else None
+        cmds = cmds if seekable else cmds[:1]
+    try:
+        if piped:
+            _run_piped(*piped)
+        else:
+            for i, cmd in enumerate(cmds):
+                try:
+                    if streamed and i:
+                        input_stream.seek(rewind_to)
+                    subprocess.run(cmd, check=True, stdin=input_stream)
+                    break
+                except subprocess.CalledProcessError:
+                    if i == len(cmds) - 1:
+                        raise
+        return finish()
+    finally:
+        _remove_files(temp_files)
+
+
+async def render_template_clips_batch_async(
+    input_file: str,
+    jobs: List[Dict],
+    session_id: str = None,
+    threads: Optional[int] = None
+) -> List[str]:
+    """
+    render_template_clips_batch without blocking the event loop: probing runs in a
+    thread and ffmpeg is awaited as an asyncio subprocess.
+    """
+    cmds, piped, temp_files, finish = await asyncio.to_thread(
+        _plan_template_batch, input_file, jobs, session_id, threads
+    )
+    try:
+        if piped:
+            await asyncio.to_thread(_run_piped, *piped)
+        else:
+            for i, cmd in enumerate(cmds):
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL
+                )
+                try:
+                    rc = await proc.wait()
+                except BaseException:
+                    # cancelled: don't leave ffmpeg running (and reading the .ass files removed below)
+                    if proc.returncode is None:
+                        proc.kill()
+                        await proc.wait()
+                    raise
+                if not rc:
+                    break
+                if i == len(cmds) - 1:
+                    raise subprocess.CalledProcessError(rc, cmd)
+        return await asyncio.to_thread(finish)
+    finally:
+        _remove_files(temp_files)
+
+
+def render_template_clip(
+    input_file: str,
+    start: float,
+    end: float,
+    template: Dict,
+    output_name: str,
+    session_id: str = None,
+    threads: Optional[int] = None,
+    input_stream: Optional[IO[bytes]] = None
+) -> str:
+    """
+    Renders a clip using a JSON-based template that supports multiple text overlays.
+    With input_stream the source is piped into ffmpeg instead of read from DOWNLOADS_DIR.
+
+    Returns the output filename (relative to CLIPS_DIR).
+    """
+    job = {"start": start, "end": end, "template": template, "output_name": output_name}
+    return render_template_clips_batch(input_file, [job], session_id, threads, input_stream)[0]
+
+
+async def render_template_clip_async(
+    input_file: str,
+    start: float,
+    end: float,
+    template: Dict,
+    output_name: str,
+    session_id: str = None,
+    threads: Optional[int] = None
+) -> str:
+    """Async render_template_clip, for callers running inside an event loop"""
+    job = {"start": start, "end": end, "template": template, "output_name": output_name}
+    return (await render_template_clips_batch_async(input_file, [job], session_id, threads))[0]
+
+
+def _unique_output_names(jobs: List[Dict]) -> List[str]:
+    """
+    Output names for jobs, unique after sanitizing (the form they're written under);
+    a taken name gets _1, _2, ... until it's free, so no two workers share a file.
+    """
+    used = set()
+    names = []
+    for job in jobs:
+        name = candidate = _safe_name(job["output_name"])
+        n = 1
+        while candidate in used:
+            candidate = f"{name}_{n}"
+            n += 1
+        used.add(candidate)
+        names.append(candidate)
+    return names
+
+
+def render_template_clips_parallel(jobs: List[Dict], session_id: str = None, max_workers: int = None) -> List[str]:
+    """
+    Renders independent template clips in parallel ffmpeg processes.
+    Each job is a dict with input_file, start, end, template and output_name.
+    max_workers defaults to $VMAKER_PARALLEL or half the cores; each ffmpeg gets
+    cores // max_workers threads so the pool doesn't oversubscribe the CPU.
+
+    Returns the output filenames (relative to CLIPS_DIR), in job order.
+    """
+    cores = os.cpu_count() or 2
+    if max_workers is None:
+        max_workers = int(os.getenv("VMAKER_PARALLEL", str(max(1, cores // 2))))
+    max_workers = max(1, min(max_workers, len(jobs)))
+    threads = max(1, cores // max_workers)
+
+    names = _unique_output_names(jobs)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(render_template_clip, job["input_file"], job["start"], job["end"],
+                        job["template"], name, session_id, threads)
+            for job, name in zip(jobs, names)
+        ]
+        return [f.result() for f in futures]
+
+
+async def render_template_clips_async(jobs: List[Dict], session_id: str = None, max_concurrency: int = None) -> List:
+    """
+    Async counterpart of render_template_clips_parallel: at most max_concurrency
+    (default half the cores) ffmpeg processes run at once, none of them blocking
+    the event loop. Returns one entry per job, in order: the output filename, or
+    the exception that job raised.
+    """
+    cores = os.cpu_count() or 2
+    max_concurrency = max(1, max_concurrency or cores // 2)
+    threads = max(1, cores // max_concurrency)
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async def run(job: Dict, name: str) -> str:
+        async with sem:
+            return await render_template_clip_async(job["input_file"], job["start"], job["end"],
+                                                    job["template"], name, session_id, threads)
+
+    return await asyncio.gather(*(run(job, name) for job, name in zip(jobs, _unique_output_names(jobs))),
+                                return_exceptions=True)
 
 
 # ---------------------------
@@ -107,53 +1042,110 @@ def render_template_clip(
 # ---------------------------
 def merge_clips(clips: List[str], output_name: str, session_id: str = None) -> str:
     """
-    Concatenate clips using ffmpeg concat demuxer.
+    Concatenate clips using ffmpeg concat demuxer: stream copy when every clip shares
+    codec/profile/size/pix_fmt, otherwise one re-encode scaled (and padded) to the
+    first clip's size. Plain copy trims keep the source's parameters, so a merge of
+    them with encoded template clips takes the re-encode path.
+    A single clip is copied to the output without running ffmpeg.
     clips: list of filenames located in CLIPS_DIR
     output_name: final output filename (e.g. 'merged.mp4')
     session_id: optional; will copy resulting file into session folder
     Returns final filename (relative to CLIPS_DIR)
     """
-    # make list file
-    list_file = os.path.join(CLIPS_DIR, f"merge_{uuid_name(output_name)}.txt")
-    with open(list_file, "w", encoding="utf-8") as f:
+    if len(clips) == 1:
+        src = os.path.join(CLIPS_DIR, clips[0])
+        if not os.path.exists(src):
+            raise FileNotFoundError(f"Clip not found: {src}")
+        final = f"{output_name}"
+        output_path = os.path.join(CLIPS_DIR, final)
+        if os.path.abspath(src) != os.path.abspath(output_path):
+            # a real copy: a link would change along with any later render to the clip's name
+            _copy_into_place(src, output_path)
+        if session_id:
+            _mirror_to_session(output_path, os.path.join(_make_session_folder(session_id), final))
+        return final
+
+    for c in clips:
+        if not os.path.exists(os.path.join(CLIPS_DIR, c)):
+            raise FileNotFoundError(f"Clip not found: {os.path.join(CLIPS_DIR, c)}")
+
+    keys = ("codec_name", "profile", "width", "height", "pix_fmt")
+    infos = [probe_video(os.path.join(CLIPS_DIR, c)) for c in clips]
+    same_params = all(infos) and len({tuple(info.get(k) for k in keys) for info in infos}) == 1
+    w, h = infos[0].get("width") or 1080, infos[0].get("height") or 1920
+    merge_vf = (f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+                f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1,format=yuv420p")
+
+    # list file on tmpfs when available; concat resolves relative entries against
+    # the list's folder, so write absolute paths
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".txt", dir="/dev/shm" if os.path.isdir("/dev/shm") else None,
+        delete=False, encoding="utf-8"
+    ) as f:
+        list_file = f.name
         for c in clips:
-            full = os.path.join(CLIPS_DIR, c)
-            if not os.path.exists(full):
-                raise FileNotFoundError(f"Clip not found: {full}")
+            full = os.path.abspath(os.path.join(CLIPS_DIR, c)).replace("'", "'\\''")
             f.write(f"file '{full}'\n")
 
     final = f"{output_name}"
     output_path = os.path.join(CLIPS_DIR, final)
 
-    cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_file, "-c", "copy", output_path]
-    subprocess.run(cmd, check=True)
+    # -seekable 0 / -thread_queue_size apply to the list input only; clips are still opened seekable.
+    # +genpts fills missing pts so timestamps stay continuous across clip boundaries
+    # with a session: hardlink afterwards on the same filesystem, else tee writes it in the same pass
+    session_path = os.path.join(_make_session_folder(session_id), final) if session_id else None
+    link_session = bool(session_path) and _same_device(CLIPS_DIR, os.path.dirname(session_path))
 
-    # copy to session folder if present
-    if session_id:
-        session_folder = _make_session_folder(session_id)
-        try:
-            import shutil
-            shutil.copy(output_path, os.path.join(session_folder, final))
-        except Exception:
-            pass
+    # written under temp names and renamed on success, see _plan_template_batch
+    renames = [(_part_path(output_path), output_path)]
+    if session_path and not link_session:
+        renames.append((_part_path(session_path), session_path))
+
+    def build_cmd(encoder: Optional[str]) -> List[str]:
+        if same_params:
+            codec_args = ["-map", "0", "-c", "copy"]
+        else:
+            codec_args = ["-map", "0:v:0", "-map", "0:a?"] + encode_args(encoder, merge_vf)
+        return [
+            "ffmpeg", "-y", *([] if same_params else hw_input_args(encoder)),
+            "-seekable", "0", "-thread_queue_size", "1024", "-fflags", "+genpts",
+            "-f", "concat", "-safe", "0", "-i", list_file,
+            *codec_args,
+            *_output_target(*(part for part, _ in renames), movflags="+faststart")
+        ]
 
-    # cleanup list file
+    encoder = None if same_params else detect_hw_encoder()
     try:
-        os.remove(list_file)
-    except Exception:
-        pass
+        try:
+            subprocess.run(build_cmd(encoder), check=True)
+        except subprocess.CalledProcessError:
+            if not encoder:
+                raise
+            # GPU out of sessions/memory: redo the re-encode on libx264
+            subprocess.run(build_cmd(None), check=True)
+        for part, dst in renames:
+            os.replace(part, dst)
+    finally:
+        os.unlink(list_file)
+        _remove_files([part for part, _ in renames])
+    if link_session:
+        _mirror_to_session(output_path, session_path)
 
     return final
 
 
 def uuid_name(s: str) -> str:
     """helper to create a safe list file name based on string"""
-    return "".join(c if c.isalnum() or c in "-_" else "_" for c in s) + "_" + str(int(time.time()))
+    # random suffix: two merges of the same name in the same second must not share a list file
+    return _SANITIZE_LIST.sub("_", s) + "_" + secrets.token_hex(4)
 
 
 # ---------------------------
 # 3. Cleanup Session
 # ---------------------------
+_TRANSCRIPT_EXTS = {"txt", "vtt", "srt"}
+
+
 def cleanup_session(session_id: str, delete_clips: bool = True, delete_video: bool = True) -> bool:
     """
     Deletes files inside a session folder based on flags. Returns True on success.
@@ -164,30 +1156,37 @@ def cleanup_session(session_id: str, delete_clips: bool = True, delete_video: bo
          transcript.txt
          merged_result.mp4
     """
+    _created_sessions.discard(session_id)
     session_folder = os.path.join(SESSIONS_DIR, session_id)
     if not os.path.exists(session_folder):
         return False
 
-    for fname in os.listdir(session_folder):
-        full = os.path.join(session_folder, fname)
-        try:
-            if fname.endswith(".mp4"):
-                # treat original vs clip indistinguishably; rely on flags
-                if delete_clips or delete_video:
-                    os.remove(full)
-            elif fname.endswith(".txt") or fname.endswith(".vtt") or fname.endswith(".srt"):
-                os.remove(full)
-            else:
-                # remove any other file
-                os.remove(full)
-        except Exception:
-            pass
+    if delete_clips and delete_video:
+        # everything goes: one tree removal instead of a remove per file
+        import shutil
+        shutil.rmtree(session_folder, ignore_errors=True)
+        return True
+
+    with os.scandir(session_folder) as it:
+        for entry in it:
+            try:
+                ext = entry.name.rpartition(".")[2]
+                if ext == "mp4":
+                    # treat original vs clip indistinguishably; rely on flags
+                    if delete_clips or delete_video:
+                        os.remove(entry.path)
+                elif ext in _TRANSCRIPT_EXTS:
+                    os.remove(entry.path)
+                else:
+                    # remove any other file
+                    os.remove(entry.path)
+            except Exception:
+                pass
 
     # remove folder if empty
     try:
-        if not os.listdir(session_folder):
-            os.rmdir(session_folder)
-    except Exception:
+        os.rmdir(session_folder)
+    except OSError:
         pass
 
     return True
@@ -0,0 +1,37 @@
+# transcribe_worker.py
+"""
+Whisper transcription in a separate process (enabled with WHISPER_PROCESSES).
+
+Each worker process loads its own model once and keeps it resident. Segments
+are streamed back to the server through a queue as they are decoded, so the
+server's progress and segment events work the same as in-process
+transcription. Kept free of server imports so spawned workers start cheaply.
+"""
+from collections import namedtuple
+
+Segment = namedtuple("Segment", "start end text")
+
+_models = {}  # model name -> BatchedInferencePipeline
+
+
+def _get_model(model_kwargs: dict):
+    name = model_kwargs["model_size_or_path"]
+    model = _models.get(name)
+    if model is None:
+        from faster_whisper import WhisperModel, BatchedInferencePipeline
+        model = _models[name] = BatchedInferencePipeline(model=WhisperModel(**model_kwargs))
+    return model
+
+
+def transcribe(path: str, language, batch_size: int, model_kwargs: dict, out_queue):
+    """Transcribe path, putting a Segment on out_queue per segment and None when done"""
+    try:
+        model = _get_model(model_kwargs)
+        segments, _info = model.transcribe(
+            path, batch_size=batch_size, beam_size=5, language=language,
+            vad_filter=True, word_timestamps=False
+        )
+        for segment in segments:
+            out_queue.put(Segment(segment.start, segment.end, segment.text))
+    finally:
+        out_queue.put(None)